@@ -0,0 +1,471 @@
+"""
+Long-lived headless Chromium pool shared by the upload, sync and embed flows.
+
+Playwright's sync API is bound to the thread that started it, so every slot in
+the pool is a dedicated thread owning its own Playwright driver and Chromium
+instance. Callers hand a job to the pool and block on (or poll) the result;
+the job runs on a slot thread with a fresh page from that slot's context.
+Contexts are non-persistent and seeded with the saved storage state, so no
+profile directory is written per session; they are reused between jobs and
+recycled after a number of uses or as soon as a job crashes.
+"""
+from playwright.sync_api import sync_playwright
+from loom_session import save_session, load_storage_state, SESSION_REFRESH_INTERVAL
+from resource_filter import get_resource_filter
+from memory_governor import get_memory_governor
+from concurrent.futures import Future
+import threading
+import tempfile
+import shutil
+import fnmatch
+import socket
+import queue
+import time
+import os
+
+
+LOOM_COOKIES_FILE = "loom_cookies.json"
+LOOM_ORIGIN = "https://www.loom.com"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+BROWSER_ARGS = [
+    "--dns-prefetch-disable",
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-infobars",
+    "--window-size=1280,720",
+]
+DEFAULT_POOL_SIZE = 1
+DEFAULT_MAX_CONTEXT_USES = 20
+# How often an idle slot checks whether it should give its browser back
+IDLE_CHECK_INTERVAL = 2
+
+TMPFS_DIR = "/dev/shm"
+# Chromium's scratch files always go in a dir of this name, so the sweep never touches other programs' files
+BROWSER_TMP_SUBDIR = "loom-automation"
+# Throwaway profile dirs left by Playwright/Chromium
+PROFILE_DIR_PATTERNS = ("playwright_chromiumdev_profile-*", "playwright-artifacts-*")
+# Login profiles older versions made with tempfile.mkdtemp() in the system temp dir
+LEGACY_PROFILE_PATTERN = "tmp*"
+PROFILE_MARKERS = ("Local State", "Default")
+# Anything younger may belong to a browser that is still running
+STALE_PROFILE_AGE = 60 * 60
+
+_slot_local = threading.local()
+_browser_tmp_dir = None
+
+
+def current_worker_id():
+    """Return the 1-based id of the pool slot running the current job (or None)."""
+    return getattr(_slot_local, "worker_id", None)
+
+
+def use_browser_tmp_dir(setting):
+    """
+    Where Chromium's unavoidable scratch profile goes: a BROWSER_TMP_SUBDIR
+    folder in the system temp dir (""), in /dev/shm ("tmpfs": RAM, nothing
+    hits the disk) or in any other directory given. Playwright's driver
+    creates that profile under TMPDIR, so this must run before the first
+    browser starts.
+    """
+    global _browser_tmp_dir
+    # Read (and cached by tempfile) before TMPDIR is pointed at our own dir
+    system_tmp = tempfile.gettempdir()
+    parent = setting or system_tmp
+    if setting == "tmpfs":
+        parent = TMPFS_DIR
+        if not os.path.isdir(TMPFS_DIR):
+            print(f"[POOL] {TMPFS_DIR} not available, keeping browser profiles in the system temp dir")
+            parent = system_tmp
+    path = os.path.join(parent, BROWSER_TMP_SUBDIR)
+    os.makedirs(path, exist_ok=True)
+    _browser_tmp_dir = path
+    for name in ("TMPDIR", "TEMP", "TMP"):
+        os.environ[name] = path
+    return path
+
+
+def _is_profile_dir(entry):
+    return (entry.is_dir(follow_symlinks=False)
+            and any(fnmatch.fnmatch(entry.name, pattern) for pattern in PROFILE_DIR_PATTERNS))
+
+
+def _is_legacy_profile_dir(entry):
+    # A bare tmp* name says nothing about who made it: require an actual Chromium profile inside
+    return (entry.is_dir(follow_symlinks=False) and fnmatch.fnmatch(entry.name, LEGACY_PROFILE_PATTERN)
+            and any(os.path.exists(os.path.join(entry.path, marker)) for marker in PROFILE_MARKERS))
+
+
+def _in_use(path):
+    """
+    True if a running Chromium still holds this profile. On Linux/macOS its
+    SingletonLock is a symlink to "<hostname>-<pid>"; on Windows a live
+    profile's lock file can't be deleted, so rmtree fails there instead.
+    """
+    try:
+        target = os.readlink(os.path.join(path, "SingletonLock"))
+    except (OSError, AttributeError):
+        return False
+    host, _, pid = target.rpartition("-")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True  # another machine's browser (shared temp dir): leave it alone
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # exists, owned by someone else
+    return True
+
+
+def _last_modified(path):
+    newest = os.path.getmtime(path)
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                newest = max(newest, entry.stat(follow_symlinks=False).st_mtime)
+            except OSError:
+                pass
+    return newest
+
+
+def sweep_stale_profiles(roots=None, max_age=STALE_PROFILE_AGE):
+    """
+    Delete browser profile dirs left behind by crashed or killed runs:
+    Playwright's profile dirs in this tool's own temp dirs, and mkdtemp()
+    Chromium profiles that older versions left in the system temp dir.
+    Profiles a live Chromium still holds (another running instance, say)
+    are kept however old they look. `roots` maps a directory to the check
+    deciding which of its entries are ours. Returns the number removed.
+    """
+    if roots is None:
+        system_tmp = tempfile.gettempdir()
+        roots = {path: _is_profile_dir for path in (os.path.join(system_tmp, BROWSER_TMP_SUBDIR),
+                                                    os.path.join(TMPFS_DIR, BROWSER_TMP_SUBDIR),
+                                                    _browser_tmp_dir) if path}
+        if os.path.basename(system_tmp) != BROWSER_TMP_SUBDIR:
+            roots[system_tmp] = _is_legacy_profile_dir
+    removed = 0
+    now = time.time()
+    for root, is_ours in roots.items():
+        if not os.path.isdir(root):
+            continue
+        with os.scandir(root) as entries:
+            for entry in entries:
+                try:
+                    if not is_ours(entry) or now - _last_modified(entry.path) < max_age:
+                        continue
+                    if _in_use(entry.path):
+                        continue
+                    shutil.rmtree(entry.path)
+                    removed += 1
+                except OSError as e:
+                    print(f"[POOL] Could not remove stale profile {entry.path}: {e}")
+    if removed:
+        print(f"[POOL] Removed {removed} stale browser profile dirs")
+    return removed
+
+
+class BrowserSlot(threading.Thread):
+    """One pool worker: owns a Playwright driver, a browser and a reusable context."""
+
+    def __init__(self, pool, worker_id):
+        super().__init__(name=f"browser-{worker_id}", daemon=True)
+        self.pool = pool
+        self.worker_id = worker_id
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.context_uses = 0
+
+    def run(self):
+        _slot_local.worker_id = self.worker_id
+        try:
+            try:
+                self._ensure_browser()
+            except Exception as e:
+                # Not fatal here: every job retries the launch and fails with the real error
+                print(f"[POOL] Worker {self.worker_id} could not start Chromium: {e}")
+            while True:
+                try:
+                    item = self.pool._jobs.get(timeout=IDLE_CHECK_INTERVAL)
+                except queue.Empty:
+                    self._shed_if_pressured()
+                    continue
+                if item is None:
+                    break
+                future, job, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = self._run_job(job, args, kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+        finally:
+            self._close_context()
+            if self.browser:
+                try:
+                    self.browser.close()
+                except Exception:
+                    pass
+            if self.playwright:
+                self.playwright.stop()
+
+    def _ensure_browser(self):
+        if self.browser and self.browser.is_connected():
+            return
+        self._close_context()
+        if self.playwright is None:
+            self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(headless=True, args=BROWSER_ARGS)
+        self.pool._count("browser_launches")
+        print(f"[POOL] Worker {self.worker_id} launched Chromium")
+
+    def _ensure_context(self):
+        self._ensure_browser()
+        if self.context and self.context_uses >= self.pool.max_context_uses:
+            print(f"[POOL] Worker {self.worker_id} recycling context after {self.context_uses} uses")
+            self._close_context()
+            self.pool._count("contexts_recycled")
+        if self.context is None:
+            storage_state = None
+            if os.path.exists(self.pool.cookies_file):
+                storage_state = load_storage_state(self.pool.cookies_file)
+            self.context = self.browser.new_context(
+                viewport={"width": 1280, "height": 720},
+                user_agent=USER_AGENT,
+                storage_state=storage_state,
+            )
+            self.context.grant_permissions(["clipboard-read", "clipboard-write"], origin=LOOM_ORIGIN)
+            # Every page of the context, including extra tabs a job opens, gets the request filter
+            self.context.on("page", self._filter_page)
+            self.context_uses = 0
+            self.pool._count("contexts_created")
+        else:
+            self.pool._count("context_reuses")
+        self.context_uses += 1
+        return self.context
+
+    def _filter_page(self, page):
+        try:
+            stats = get_resource_filter().attach(page)
+        except Exception as e:
+            print(f"[POOL] Worker {self.worker_id} could not install the request filter: {e}")
+            return
+        if stats is not None:
+            page.on("close", lambda page: self.pool._page_closed(stats, page.url))
+
+    def _shed_if_pressured(self):
+        if self.browser is None or not get_memory_governor().under_pressure():
+            return
+        # Idle under memory pressure: give the whole browser back, it's relaunched on the next job
+        print(f"[MEMORY] Worker {self.worker_id} closing its idle browser to free memory")
+        self._close_context()
+        try:
+            self.browser.close()
+        except Exception:
+            pass
+        self.browser = None
+        self.pool._count("browsers_shed")
+
+    def _close_context(self):
+        if self.context is not None:
+            try:
+                self.context.close()
+            except Exception:
+                pass
+        self.context = None
+        self.context_uses = 0
+
+    def _run_job(self, job, args, kwargs):
+        if self.pool._generation != getattr(self, "_generation", None):
+            # Cookies changed (new login), don't hand out a stale session
+            self._close_context()
+            self._generation = self.pool._generation
+        governor = get_memory_governor()
+        waited = governor.admit(self.pool._others_running, label=f"Worker {self.worker_id}")
+        if waited:
+            self.pool._count("admission_waits")
+        self.pool._job_started()
+        try:
+            return self._run_admitted(job, args, kwargs)
+        finally:
+            self.pool._job_finished()
+            governor.job_finished()
+
+    def _run_admitted(self, job, args, kwargs):
+        context = self._ensure_context()
+        page = context.new_page()
+        self.pool._count("jobs")
+        try:
+            result = job(page, *args, **kwargs)
+            self.pool._maybe_save_session(context, page)
+            return result
+        except BaseException:
+            # Treat any failure as a possibly wedged context and start clean next time
+            self._close_context()
+            self.pool._count("contexts_crashed")
+            raise
+        finally:
+            try:
+                if not page.is_closed():
+                    page.close()
+            except Exception:
+                pass
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of BrowserSlot threads fed from a shared job queue.
+
+    `run(job, *args)` blocks until a slot has executed `job(page, *args)` and
+    returns its result; `submit` returns a Future instead.
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE, max_context_uses=DEFAULT_MAX_CONTEXT_USES,
+                 cookies_file=LOOM_COOKIES_FILE):
+        self.size = max(1, int(size))
+        self.max_context_uses = max(1, int(max_context_uses))
+        self.cookies_file = cookies_file
+        self._jobs = queue.Queue()
+        self._slots = []
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._running = 0
+        self.session_refresh_interval = SESSION_REFRESH_INTERVAL
+        self._last_session_save = time.time()
+        self._stats = {
+            "browser_launches": 0,
+            "contexts_created": 0,
+            "context_reuses": 0,
+            "contexts_recycled": 0,
+            "contexts_crashed": 0,
+            "jobs": 0,
+            "sessions_saved": 0,
+            "requests_blocked": 0,
+            "bytes_saved": 0,
+            "admission_waits": 0,
+            "browsers_shed": 0,
+        }
+
+    def warm(self):
+        """Start the slot threads (and their browsers) ahead of the first job, replacing dead ones."""
+        with self._lock:
+            for index, slot in enumerate(self._slots):
+                if not slot.is_alive():
+                    print(f"[POOL] Worker {slot.worker_id} had stopped, starting a new one")
+                    self._slots[index] = BrowserSlot(self, slot.worker_id)
+                    self._slots[index].start()
+            while len(self._slots) < self.size:
+                slot = BrowserSlot(self, len(self._slots) + 1)
+                self._slots.append(slot)
+                slot.start()
+
+    def ensure_size(self, size):
+        """Grow the pool to at least `size` slots (slots are never shrunk)."""
+        with self._lock:
+            self.size = max(self.size, int(size))
+        self.warm()
+
+    def submit(self, job, *args, **kwargs):
+        self.warm()
+        future = Future()
+        self._jobs.put((future, job, args, kwargs))
+        return future
+
+    def run(self, job, *args, **kwargs):
+        return self.submit(job, *args, **kwargs).result()
+
+    def _maybe_save_session(self, context, page):
+        """
+        Called on a slot thread after a successful job: every
+        `session_refresh_interval` seconds, write the live (and therefore
+        freshly extended) session back to the cookies file, so long batches
+        never run down the saved one.
+        """
+        with self._lock:
+            if time.time() - self._last_session_save < self.session_refresh_interval:
+                return
+            self._last_session_save = time.time()
+        try:
+            if "/login" in page.url or "/signup" in page.url:
+                return
+            expires_at = save_session(context, self.cookies_file)
+        except Exception as e:
+            print(f"[POOL] Could not save the browser session: {e}")
+            return
+        if expires_at is not None:
+            self._count("sessions_saved")
+            print(f"[POOL] Saved live session, now valid until {time.strftime('%Y-%m-%d %H:%M', time.localtime(expires_at))}")
+
+    def _job_started(self):
+        with self._lock:
+            self._running += 1
+
+    def _job_finished(self):
+        with self._lock:
+            self._running -= 1
+
+    def _others_running(self):
+        # Called before the waiting job counts itself as running
+        with self._lock:
+            return self._running > 0
+
+    def _page_closed(self, stats, url):
+        # Anything blocked after the last load event (lazy images, trackers) is reported here
+        stats.report(url)
+        self._count("requests_blocked", stats.total_requests)
+        self._count("bytes_saved", stats.total_bytes)
+
+    def reset_sessions(self):
+        """Drop every cached context at its next job, e.g. after a fresh login."""
+        with self._lock:
+            self._generation += 1
+
+    def close(self):
+        with self._lock:
+            slots, self._slots = self._slots, []
+        for _ in slots:
+            self._jobs.put(None)
+        for slot in slots:
+            slot.join(timeout=10)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def stats_text(self):
+        s = self.stats()
+        return (f"{s['jobs']} browser jobs, {s['browser_launches']} Chromium launches, "
+                f"{s['contexts_created']} contexts created, {s['context_reuses']} reused, "
+                f"{s['requests_blocked']} requests blocked (~{s['bytes_saved'] / 1_000_000:.0f} MB saved)")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(size=None, max_context_uses=None):
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                size=size or DEFAULT_POOL_SIZE,
+                max_context_uses=max_context_uses or DEFAULT_MAX_CONTEXT_USES,
+            )
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
@@ -0,0 +1,200 @@
+"""
+Browserless upload engine.
+
+Streams a file over HTTP using the tus resumable-upload protocol that Uppy's
+Tus plugin speaks, authenticated with the cookies saved in loom_cookies.json:
+
+    POST  <endpoint>          create an upload (Upload-Length, Upload-Metadata)
+    HEAD  <upload url>        current Upload-Offset (used to resume)
+    PATCH <upload url>        append a chunk at Upload-Offset
+    POST  <finalize url>      optional: exchange the upload for a share URL
+
+The endpoints are configuration (`direct_upload_endpoint` and
+`direct_upload_finalize_url` in loom_config.json), so the engine can be
+pointed at the stand-in server (`python upload_standin.py`) to exercise it
+offline. The saved Loom cookies are only sent to loom.com and to a stand-in
+on this machine, and only those hosts' 401/403 mean the Loom session has
+expired; any other failure, including auth errors from other endpoints,
+makes upload_videos fall back to the Chromium flow.
+"""
+from retry_policy import AuthExpired, ServerError, FileRejected, UploadError
+from urllib.parse import urlsplit, urljoin
+import http.client
+import base64
+import json
+import os
+import time
+
+
+TUS_VERSION = "1.0.0"
+LOOM_HOST = "www.loom.com"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+DIRECT_CHUNK_SIZE = 8 * 1024 * 1024
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+
+class UploadCancelled(Exception):
+    """Raised from an `on_progress` callback to stop an upload between chunks."""
+
+
+def cookie_header(cookies, host):
+    """Build a Cookie header from Playwright-style cookies that apply to `host`."""
+    pairs = []
+    now = time.time()
+    for cookie in cookies:
+        domain = cookie.get("domain", "").lstrip(".")
+        if domain and not (host == domain or host.endswith("." + domain)):
+            continue
+        expires = cookie.get("expires", -1)
+        if expires not in (None, -1) and expires < now:
+            continue
+        pairs.append(f"{cookie['name']}={cookie['value']}")
+    return "; ".join(pairs)
+
+
+def is_loom_host(host):
+    return host == "loom.com" or host.endswith(".loom.com")
+
+
+def _metadata(pairs):
+    return ",".join(f"{key} {base64.b64encode(str(value).encode()).decode()}" for key, value in pairs.items())
+
+
+class DirectUploader:
+    def __init__(self, endpoint, cookies, finalize_url=None, chunk_size=DIRECT_CHUNK_SIZE, timeout=120):
+        if not endpoint:
+            raise ValueError("No direct upload endpoint configured")
+        self.endpoint = endpoint
+        self.finalize_url = finalize_url
+        self.cookies = cookies
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self._connections = {}
+
+    # -- HTTP plumbing ------------------------------------------------------
+    def _connection(self, parts):
+        key = (parts.scheme, parts.netloc)
+        conn = self._connections.get(key)
+        if conn is None:
+            cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            conn = self._connections[key] = cls(parts.netloc, timeout=self.timeout)
+        return conn
+
+    @staticmethod
+    def _speaks_for_loom(host):
+        # Loom itself, or the local stand-in playing Loom
+        return is_loom_host(host) or host in LOOPBACK_HOSTS
+
+    def _request(self, method, url, body=None, headers=None):
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        all_headers = {
+            "Tus-Resumable": TUS_VERSION,
+            "User-Agent": USER_AGENT,
+            "Cookie": cookie_header(self.cookies, LOOM_HOST if self._speaks_for_loom(host) else host),
+        }
+        all_headers.update(headers or {})
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        conn = self._connection(parts)
+        try:
+            conn.request(method, path, body=body, headers=all_headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            # Keep-alive connection went stale; reconnect once
+            conn.close()
+            self._connections.pop((parts.scheme, parts.netloc), None)
+            conn = self._connection(parts)
+            conn.request(method, path, body=body, headers=all_headers)
+            response = conn.getresponse()
+            data = response.read()
+        self._check(response, data, method, url)
+        return response, data
+
+    def _check(self, response, data, method, url):
+        if response.status in (401, 403) and self._speaks_for_loom(urlsplit(url).hostname or ""):
+            raise AuthExpired(f"{method} {url} returned {response.status}")
+        if response.status in (413, 415):
+            raise FileRejected(f"{method} {url} returned {response.status}: {data[:200]!r}")
+        if response.status >= 500:
+            raise ServerError(f"{method} {url} returned {response.status}")
+        if response.status >= 400:
+            raise UploadError(f"{method} {url} returned {response.status}: {data[:200]!r}")
+
+    def close(self):
+        for conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+    # -- tus protocol -------------------------------------------------------
+    def create(self, file_path, title, space_url=None):
+        size = os.path.getsize(file_path)
+        metadata = {"filename": title, "name": title, "filetype": "video/*"}
+        if space_url:
+            metadata["space_url"] = space_url
+        response, _ = self._request("POST", self.endpoint, headers={
+            "Upload-Length": str(size),
+            "Upload-Metadata": _metadata(metadata),
+            "Content-Length": "0",
+        })
+        location = response.getheader("Location")
+        if not location:
+            raise UploadError("Upload creation returned no Location")
+        return urljoin(self.endpoint, location)
+
+    def offset(self, upload_url):
+        response, _ = self._request("HEAD", upload_url)
+        return int(response.getheader("Upload-Offset") or 0)
+
+    def upload(self, file_path, title, on_progress=None, upload_url=None, on_created=None, space_url=None):
+        """
+        Upload `file_path` and return the Loom share URL.
+
+        `on_progress(percent, mb_per_s)` is called after every chunk and may
+        raise UploadCancelled. `on_created(upload_url)` receives the URL of a
+        newly created upload; pass it back as `upload_url` on a later attempt
+        to resume from the server's offset.
+        """
+        size = os.path.getsize(file_path)
+        if not upload_url:
+            upload_url = self.create(file_path, title, space_url)
+            if on_created:
+                on_created(upload_url)
+        offset = self.offset(upload_url)
+        start_time = time.time()
+        start_offset = offset
+        last_response, last_data = None, b""
+
+        with open(file_path, "rb") as fh:
+            fh.seek(offset)
+            while offset < size:
+                chunk = fh.read(self.chunk_size)
+                last_response, last_data = self._request("PATCH", upload_url, body=chunk, headers={
+                    "Upload-Offset": str(offset),
+                    "Content-Type": "application/offset+octet-stream",
+                    "Content-Length": str(len(chunk)),
+                })
+                offset = int(last_response.getheader("Upload-Offset") or offset + len(chunk))
+                if on_progress:
+                    elapsed = max(time.time() - start_time, 0.1)
+                    on_progress(int(offset * 100 / size) if size else 100,
+                                (offset - start_offset) / 1_000_000 / elapsed)
+
+        return self.share_url(upload_url, title, last_data)
+
+    def share_url(self, upload_url, title, last_body=b""):
+        if self.finalize_url:
+            _, data = self._request("POST", self.finalize_url,
+                                    body=json.dumps({"upload_url": upload_url, "name": title}).encode(),
+                                    headers={"Content-Type": "application/json"})
+            last_body = data
+        try:
+            payload = json.loads(last_body or b"{}")
+        except ValueError:
+            payload = {}
+        share_url = payload.get("share_url") or payload.get("url")
+        if not share_url:
+            raise UploadError("Upload finished but the server returned no share URL")
+        return share_url
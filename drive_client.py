@@ -0,0 +1,99 @@
+"""
+Process-wide Google Drive client factory.
+
+Building a Drive client used to cost a service-account file read, a
+discovery-document parse, a fresh TLS connection and, on the first call, an
+OAuth token exchange. Here the discovery document is loaded once per process
+(the copy bundled with google-api-python-client, else a file cached on disk).
+Credentials are shared and refreshed under a lock only when they expire.
+Each thread gets its own keep-alive AuthorizedHttp, because httplib2 is not
+thread-safe, and reuses it for every listing page and download chunk.
+"""
+from googleapiclient.discovery import build_from_document
+from google.oauth2 import service_account
+import google_auth_httplib2
+import threading
+import httplib2
+import json
+import os
+
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.readonly']
+DRIVE_DISCOVERY_URL = "https://www.googleapis.com/discovery/v1/apis/drive/v3/rest"
+DRIVE_DISCOVERY_FILE = "drive_v3_discovery.json"
+HTTP_TIMEOUT = 120
+
+_discovery_doc = None
+_discovery_lock = threading.Lock()
+
+
+def drive_discovery_document(cache_file=DRIVE_DISCOVERY_FILE):
+    """The Drive v3 discovery document, loaded at most once per process."""
+    global _discovery_doc
+    with _discovery_lock:
+        if _discovery_doc is not None:
+            return _discovery_doc
+        doc = None
+        try:
+            from googleapiclient.discovery_cache import get_static_doc
+            doc = get_static_doc("drive", "v3")
+        except ImportError:
+            pass
+        if doc is None and os.path.exists(cache_file):
+            with open(cache_file, "r") as f:
+                doc = f.read()
+        if doc is None:
+            response, content = httplib2.Http(timeout=HTTP_TIMEOUT).request(DRIVE_DISCOVERY_URL)
+            if response.status != 200:
+                raise IOError(f"Could not fetch the Drive discovery document: HTTP {response.status}")
+            doc = content.decode("utf-8")
+            tmp_path = cache_file + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(doc)
+            os.replace(tmp_path, cache_file)
+        _discovery_doc = json.loads(doc) if isinstance(doc, str) else doc
+        return _discovery_doc
+
+
+class DriveClientFactory:
+    """Drive clients for one service-account file: shared credentials, one client per thread."""
+
+    def __init__(self, service_file, scopes=DRIVE_SCOPES):
+        self.service_file = service_file
+        self.credentials = service_account.Credentials.from_service_account_file(service_file, scopes=scopes)
+        self.refresh_lock = threading.Lock()
+        self.local = threading.local()
+        self.refreshes = 0
+
+    def _ensure_fresh(self, http):
+        # `valid` already allows for clock skew; only one thread does the token exchange
+        if self.credentials.valid:
+            return
+        with self.refresh_lock:
+            if not self.credentials.valid:
+                self.credentials.refresh(google_auth_httplib2.Request(http))
+                self.refreshes += 1
+
+    def service(self):
+        """The calling thread's Drive client, with credentials refreshed if they expired."""
+        service = getattr(self.local, "service", None)
+        if service is None:
+            self.local.http = httplib2.Http(timeout=HTTP_TIMEOUT)
+            authed_http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=self.local.http)
+            service = self.local.service = build_from_document(drive_discovery_document(), http=authed_http)
+        self._ensure_fresh(self.local.http)
+        return service
+
+
+_factories = {}
+_factories_lock = threading.Lock()
+
+
+def get_drive_factory(service_file):
+    # A replaced key file gets a new factory
+    key = (os.path.abspath(service_file), os.path.getmtime(service_file))
+    with _factories_lock:
+        factory = _factories.get(key)
+        if factory is None:
+            factory = _factories[key] = DriveClientFactory(service_file)
+        return factory
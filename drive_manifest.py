@@ -0,0 +1,162 @@
+"""
+Persistent record of which Google Drive files were already fetched and uploaded.
+
+Entries are keyed by Drive file id and remember the md5Checksum/modifiedTime
+seen at download time, the local file name, and the Loom URL once uploaded.
+download_videos diffs each folder listing against it so unchanged files are
+never fetched twice.
+
+Drive allows several files with the same name (and subfolders are flattened
+into one download folder), so each file id claims its own local name:
+the Drive name when it's free, else prefixed with its subfolder path, else
+suffixed with the start of the file id.
+"""
+import threading
+import json
+import os
+import time
+
+
+def _safe_name(name):
+    return name.replace("/", "_").replace("\\", "_").strip() or "video"
+
+
+DRIVE_MANIFEST_FILE = "drive_manifest.json"
+
+
+class DriveManifest:
+    def __init__(self, path=DRIVE_MANIFEST_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[MANIFEST] Could not read {path}, starting fresh: {e}")
+        # local name -> file id, so claiming and name lookups don't scan every entry.
+        # Manifests from older versions may hold duplicate names: the latest download wins
+        self.names = {}
+        for file_id, entry in sorted(self.entries.items(), key=lambda item: item[1].get("downloaded_at", "")):
+            if entry.get("name"):
+                self.names[entry["name"]] = file_id
+
+    def _save(self):
+        # Write-then-rename so a crash never leaves a truncated manifest
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+
+    def _set_name(self, file_id, name):
+        entry = self.entries.setdefault(file_id, {})
+        old_name = entry.get("name")
+        if old_name and self.names.get(old_name) == file_id:
+            del self.names[old_name]
+        entry["name"] = name
+        self.names[name] = file_id
+        return entry
+
+    def is_unchanged(self, video, download_dir):
+        """
+        True if this Drive file was already handled in an earlier run and has
+        not changed since: it was uploaded, or its download is still on disk.
+        """
+        with self.lock:
+            entry = self.entries.get(video["id"])
+        if not entry:
+            return False
+        if video.get("md5Checksum") and entry.get("md5Checksum") != video.get("md5Checksum"):
+            return False
+        if entry.get("modifiedTime") != video.get("modifiedTime"):
+            return False
+        if entry.get("loom_url"):
+            return True
+        return os.path.isfile(os.path.join(download_dir, entry.get("name", "")))
+
+    def claim_local_name(self, video):
+        """
+        The local file name for this Drive file, unique among every file the
+        manifest knows. Claims are held in memory; they reach the file with
+        the next save (when a download starts or finishes).
+        """
+        with self.lock:
+            entry = self.entries.get(video["id"])
+            if entry and entry.get("name"):
+                return entry["name"]
+            name = _safe_name(video["name"])
+            stem, ext = os.path.splitext(name)
+            candidates = [name]
+            if video.get("folder_path"):
+                # Subfolders are flattened into one download folder; keep them apart by path
+                candidates.append(_safe_name(video["folder_path"].replace("/", " - ") + " - " + name))
+            candidates.append(f"{stem} [{video['id'][:8]}]{ext}")
+            local_name = next((c for c in candidates if self.names.get(c, video["id"]) == video["id"]),
+                              f"{stem} [{video['id']}]{ext}")
+            self._set_name(video["id"], local_name)
+            return local_name
+
+    def begin_download(self, video):
+        """
+        Note which version of the Drive file its .part download is for. True
+        if a .part left by an earlier attempt was for this same version and
+        can be resumed.
+        """
+        version = {"md5Checksum": video.get("md5Checksum"), "modifiedTime": video.get("modifiedTime")}
+        with self.lock:
+            entry = self.entries.setdefault(video["id"], {})
+            resumable = entry.get("partial") == version
+            entry["partial"] = version
+            self._save()
+            return resumable
+
+    def record_download(self, video, name=None):
+        with self.lock:
+            entry = self._set_name(video["id"], name or video["name"])
+            entry.pop("partial", None)
+            if entry.get("md5Checksum") != video.get("md5Checksum") or entry.get("modifiedTime") != video.get("modifiedTime"):
+                entry.pop("loom_url", None)  # new content, needs a new upload
+            entry.update({
+                "md5Checksum": video.get("md5Checksum"),
+                "modifiedTime": video.get("modifiedTime"),
+                "size": int(video.get("size") or 0),
+                "downloaded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            self._save()
+
+    def _find_by_name(self, name):
+        file_id = self.names.get(name)
+        return self.entries.get(file_id) if file_id else None
+
+    def record_upload(self, name, loom_url):
+        """Attach the Loom URL to the Drive file that was downloaded as `name`."""
+        with self.lock:
+            entry = self._find_by_name(name)
+            if entry is None:
+                return False
+            entry["loom_url"] = loom_url
+            entry["uploaded_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            self._save()
+            return True
+
+    def rename(self, old_name, new_name):
+        """Keep the name mapping in step with a local rename before upload."""
+        with self.lock:
+            file_id = self.names.get(old_name)
+            if file_id is not None:
+                self._set_name(file_id, new_name)
+                self._save()
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest():
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = DriveManifest()
+        return _manifest
@@ -0,0 +1,214 @@
+"""
+Download-folder watching for the "Videos to Upload" list.
+
+FolderWatcher runs in a background thread and rescans the folder only when
+the OS reports a change (inotify on Linux, through ctypes), falling back to
+a slow listdir poll elsewhere. Bursts of events, such as a download being
+written and then renamed into place, are debounced into a single rescan.
+The GUI thread picks up the latest snapshot once per tick, and
+ListboxMirror applies it to the listbox as one batched diff.
+"""
+import ctypes.util
+import threading
+import select
+import ctypes
+import struct
+import time
+import sys
+import os
+
+
+POLL_INTERVAL = 2.0
+# Wait for this much quiet after an event before rescanning...
+DEBOUNCE_SECONDS = 0.3
+# ...but never hold a rescan back for longer than this during a steady stream
+MAX_DEBOUNCE_SECONDS = 2.0
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimal ctypes binding: one non-blocking inotify fd watching one directory."""
+
+    def __init__(self, path, mask=WATCH_MASK):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {path}")
+
+    def wait(self, timeout):
+        """Block up to `timeout` seconds; returns the masks of the events read."""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        masks = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                _, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+                masks.append(mask)
+                offset += EVENT_HEADER.size + name_len
+        return masks
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Keeps an up-to-date snapshot of the files in `path`, ignoring names that
+    end with any of `ignore_suffixes` (e.g. in-progress ".part" downloads).
+    """
+
+    def __init__(self, path, ignore_suffixes=(), poll_interval=POLL_INTERVAL,
+                 debounce=DEBOUNCE_SECONDS, max_debounce=MAX_DEBOUNCE_SECONDS):
+        self.path = path
+        self.ignore_suffixes = tuple(ignore_suffixes)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_debounce = max_debounce
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.snapshot = None
+        self.last_files = None
+        self.mode = None
+        self.thread = threading.Thread(target=self._run, name="folder-watch", daemon=True)
+
+    def start(self):
+        self._rescan()
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def take_snapshot(self):
+        """The file list if it changed since the last call, else None. Cheap: no disk access."""
+        with self.lock:
+            snapshot, self.snapshot = self.snapshot, None
+            return snapshot
+
+    def _rescan(self):
+        try:
+            files = sorted(f for f in os.listdir(self.path) if not f.endswith(self.ignore_suffixes))
+        except FileNotFoundError:
+            files = []
+        if files != self.last_files:
+            self.last_files = files
+            with self.lock:
+                self.snapshot = files
+
+    def _run(self):
+        if sys.platform.startswith("linux"):
+            try:
+                self._watch_inotify()
+                return
+            except OSError as e:
+                print(f"[WATCH] inotify unavailable ({e}), polling every {self.poll_interval:.0f}s")
+        self.mode = "poll"
+        while not self.stop_event.wait(self.poll_interval):
+            self._rescan()
+
+    def _watch_inotify(self):
+        inotify = Inotify(self.path)
+        self.mode = "inotify"
+        try:
+            while not self.stop_event.is_set():
+                masks = inotify.wait(1.0)
+                if not masks:
+                    continue
+                # Debounce: keep absorbing events until the folder goes quiet
+                burst_start = time.monotonic()
+                while time.monotonic() - burst_start < self.max_debounce:
+                    more = inotify.wait(self.debounce)
+                    if not more:
+                        break
+                    masks.extend(more)
+                self._rescan()
+                if any(mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED) for mask in masks):
+                    # The watched folder itself went away; polling copes with it being recreated
+                    raise OSError(0, f"{self.path} was removed or moved")
+        finally:
+            inotify.close()
+
+
+class ListboxMirror:
+    """
+    Applies file-list changes to a Tk listbox with one batched diff, using a
+    name -> index map instead of searching the listbox contents.
+    """
+
+    def __init__(self, listbox):
+        self.listbox = listbox
+        self.names = list(listbox.get(0, "end"))
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def _reindex(self):
+        self.index = {name: i for i, name in enumerate(self.names)}
+
+    def sync(self, files):
+        """Make the listbox show `files`, keeping existing rows (and the selection) in place."""
+        wanted = set(files)
+        removed = [self.index[name] for name in self.names if name not in wanted]
+        added = [name for name in files if name not in self.index]
+        if not removed and not added:
+            return
+        if len(removed) > len(self.names) // 2:
+            # Mostly cleared: one bulk rebuild beats many single deletes
+            self.listbox.delete(0, "end")
+            self.names = [name for name in self.names if name in wanted]
+            if self.names:
+                self.listbox.insert("end", *self.names)
+        else:
+            for i in sorted(removed, reverse=True):
+                self.listbox.delete(i)
+            self.names = [name for name in self.names if name in wanted]
+        if added:
+            self.listbox.insert("end", *added)
+            self.names.extend(added)
+        self._reindex()
+
+    def replace(self, files):
+        self.listbox.delete(0, "end")
+        self.names = list(files)
+        if self.names:
+            self.listbox.insert("end", *self.names)
+        self._reindex()
+
+    def remove(self, name):
+        i = self.index.get(name)
+        if i is None:
+            return
+        self.listbox.delete(i)
+        del self.names[i]
+        self._reindex()
+
+    def rename(self, old_name, new_name):
+        i = self.index.get(old_name)
+        if i is None:
+            return
+        self.listbox.delete(i)
+        self.listbox.insert(i, new_name)
+        self.names[i] = new_name
+        del self.index[old_name]
+        self.index[new_name] = i
@@ -0,0 +1,212 @@
+"""
+Headless entry point for running the pipeline on servers or from cron:
+
+    python loom_cli.py run --folder-id ID --service-file sa.json --space URL
+    python loom_cli.py daemon --interval 900
+    python loom_cli.py sync --full
+
+Settings not given as flags come from the config file (loom_config.json by
+default, the same file the GUI saves). Progress is printed to stdout as one
+JSON object per line and the exit status tells cron what happened. Never
+imports tkinter: log in once with the GUI and copy loom_cookies.json over.
+"""
+from loom_pipeline import (LOOM_COOKIES_FILE, load_config, use_config_file, pause, download_videos,
+                           upload_videos, run_download_upload_pipeline, sync_videos,
+                           generate_embed_codes, extract_embed_codes, export_excel)
+from browser_pool import shutdown_pool, use_browser_tmp_dir, sweep_stale_profiles
+from resource_filter import configure_resource_filter
+from memory_governor import configure_memory_governor
+from ui_bus import coalesce_key
+import threading
+import argparse
+import signal
+import json
+import time
+import sys
+import os
+
+
+EXIT_OK = 0
+EXIT_FAILED = 1      # the run finished but reported errors
+EXIT_USAGE = 2       # argparse's own status for bad arguments
+EXIT_AUTH = 3        # no saved Loom session, or it expired
+EXIT_INTERRUPTED = 130
+DEFAULT_DAEMON_INTERVAL = 900
+# Per-file/per-worker progress lines are printed at most this often
+PROGRESS_INTERVAL = 1.0
+
+
+class JsonLineReporter:
+    """
+    The CLI's progress_queue: prints each message as a JSON line and keeps
+    the counts the exit status is derived from. Progress messages are
+    throttled per worker like the GUI's event bus coalesces them.
+    """
+
+    def __init__(self, stream=None, min_interval=PROGRESS_INTERVAL):
+        self.stream = stream or sys.stdout
+        self.min_interval = min_interval
+        self.lock = threading.Lock()
+        self.last_printed = {}
+        self.reset()
+
+    def reset(self):
+        self.errors = 0
+        self.warnings = 0
+        self.auth_expired = False
+        self.paused = False
+
+    def put(self, item, *args, **kwargs):
+        kind = item[0]
+        with self.lock:
+            if kind == "error":
+                self.errors += 1
+            elif kind == "warning":
+                self.warnings += 1
+            elif kind == "auth_expired":
+                self.auth_expired = True
+            elif kind == "pausing":
+                self.paused = True
+            key = coalesce_key(0, item)
+            if key is not None:
+                now = time.monotonic()
+                finished = kind in ("download", "upload") and len(item) > 2 and item[2] == 100
+                if not finished and now - self.last_printed.get(key, 0) < self.min_interval:
+                    return
+                self.last_printed[key] = now
+            record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "event": kind, "data": list(item[1:])}
+            self.stream.write(json.dumps(record, default=str) + "\n")
+            self.stream.flush()
+
+    put_nowait = put
+
+    def exit_status(self):
+        if self.auth_expired:
+            return EXIT_AUTH
+        if self.paused:
+            return EXIT_INTERRUPTED
+        return EXIT_FAILED if self.errors else EXIT_OK
+
+
+def build_parser():
+    # Shared settings, accepted after any command
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", help="settings file (default: loom_config.json)")
+    common.add_argument("--folder-id", help="Google Drive folder ID")
+    common.add_argument("--service-file", help="Google service account JSON file")
+    common.add_argument("--space", help="Loom space URL to upload to / sync from")
+    common.add_argument("--upload-workers", type=int, help="concurrent upload workers")
+    common.add_argument("--download-workers", type=int, help="parallel Drive download workers")
+
+    parser = argparse.ArgumentParser(prog="loom-automate",
+                                     description="Download videos from Google Drive and upload them to Loom.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("download", parents=[common], help="download the Drive folder")
+    commands.add_parser("upload", parents=[common], help="upload everything already downloaded")
+    commands.add_parser("run", parents=[common], help="download and upload each file as soon as it lands")
+    daemon = commands.add_parser("daemon", parents=[common],
+                                 help="repeat 'run' every --interval seconds until stopped")
+    daemon.add_argument("--interval", type=int, default=DEFAULT_DAEMON_INTERVAL,
+                        help=f"seconds between runs (default: {DEFAULT_DAEMON_INTERVAL})")
+    sync = commands.add_parser("sync", parents=[common], help="add videos listed in the Loom space to the ledger")
+    sync.add_argument("--full", action="store_true", help="crawl the whole space, not just the newest videos")
+    embeds = commands.add_parser("embeds", parents=[common], help="fill in missing embed codes in the ledger")
+    embeds.add_argument("--extract", action="store_true",
+                        help="read the codes from Loom's share dialog (browser) instead of deriving them from the URL")
+    commands.add_parser("export", parents=[common], help="rewrite the Excel export from the ledger")
+    return parser
+
+
+def resolve_settings(parser, args):
+    if args.config:
+        use_config_file(args.config)
+    config = load_config()
+    settings = {
+        "folder_id": (args.folder_id or config["folder_id"]).strip(),
+        "service_file": (args.service_file or config["service_file"]).strip(),
+        "space_url": (args.space or config["space"]).strip(),
+        "upload_workers": args.upload_workers or config["upload_workers"],
+        "download_workers": args.download_workers or config["download_workers"],
+    }
+    if args.command in ("download", "run", "daemon"):
+        if not settings["folder_id"] or not settings["service_file"]:
+            parser.error("a Drive folder ID and service account file are required (flags or config file)")
+    if args.command in ("upload", "run", "daemon", "sync") and not settings["space_url"]:
+        parser.error("a Loom space URL is required (--space or config file)")
+    return settings
+
+
+def run_once(command, settings, reporter, full=False, extract=False):
+    if command == "download":
+        download_videos(settings["folder_id"], settings["service_file"], reporter,
+                        workers=settings["download_workers"])
+    elif command == "upload":
+        upload_videos(reporter, space_url=settings["space_url"], workers=settings["upload_workers"])
+    elif command in ("run", "daemon"):
+        run_download_upload_pipeline(settings["folder_id"], settings["service_file"], reporter,
+                                     space_url=settings["space_url"],
+                                     upload_workers=settings["upload_workers"],
+                                     download_workers=settings["download_workers"])
+    elif command == "sync":
+        sync_videos(reporter, full, space_url=settings["space_url"])
+    elif command == "embeds":
+        if extract:
+            extract_embed_codes(reporter)
+        else:
+            generate_embed_codes(reporter)
+    elif command == "export":
+        if not export_excel(reporter):
+            reporter.put(("error", "Excel export failed"))
+    return reporter.exit_status()
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    settings = resolve_settings(parser, args)
+    reporter = JsonLineReporter()
+    config = load_config()
+    use_browser_tmp_dir(config.get("browser_tmp_dir"))
+    configure_resource_filter(config)
+    configure_memory_governor(config)
+    sweep_stale_profiles()
+
+    needs_login = args.command in ("upload", "run", "daemon", "sync") or getattr(args, "extract", False)
+    if needs_login and not os.path.exists(LOOM_COOKIES_FILE):
+        reporter.put(("error", f"No {LOOM_COOKIES_FILE} found. Log in once with the GUI and copy it here."))
+        return EXIT_AUTH
+
+    stop = threading.Event()
+
+    def on_signal(signum, frame):
+        # First signal: let in-flight work wind down. Second: stop right away.
+        reporter.put(("status", f"Received signal {signum}, stopping after the current step"))
+        stop.set()
+        pause()
+        signal.signal(signum, signal.SIG_DFL)
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+
+    try:
+        if args.command != "daemon":
+            status = run_once(args.command, settings, reporter, full=getattr(args, "full", False),
+                              extract=getattr(args, "extract", False))
+            return EXIT_INTERRUPTED if stop.is_set() and status == EXIT_OK else status
+
+        status = EXIT_OK
+        while not stop.is_set():
+            reporter.reset()
+            status = run_once("daemon", settings, reporter)
+            if status == EXIT_AUTH:
+                # Nobody is around to log in again; retrying would only hammer Loom
+                return EXIT_AUTH
+            reporter.put(("status", f"Run finished with status {status}, next run in {args.interval}s"))
+            stop.wait(args.interval)
+        return EXIT_OK
+    finally:
+        shutdown_pool()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1030 @@
+"""
+The download/upload/sync/embed pipeline behind the GUI and the CLI.
+
+Nothing here touches tkinter: every function takes its inputs (folder id,
+service file, space URL, worker counts) as arguments, falling back to
+loom_config.json, and reports progress by putting tuples on a queue-like
+`progress_queue` (anything with a `put` method). Pausing is a
+threading.Event rather than a flag flipped by a button.
+"""
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+import time
+import os
+from googleapiclient.errors import HttpError
+import threading
+import queue
+import json
+from pathlib import Path
+import sys
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from browser_pool import get_pool, current_worker_id
+from drive_manifest import get_manifest
+from drive_client import get_drive_factory
+from loom_session import check_session, load_session_cookies, EXPIRY_WARNING
+from video_ledger import get_ledger, EXCEL_FILE
+from page_steps import Step, StepTimeout, run_steps, click
+from uppy_events import UppyMonitor
+from direct_upload import DirectUploader, UploadCancelled
+from retry_policy import (RetryPolicy, CircuitBreaker, AuthExpired, FileRejected, UploadStalled,
+                          classify, classify_uppy_error, AUTH_EXPIRED, FILE_REJECTED)
+from loom_space import (SpaceCrawl, get_space_index, loom_video_id,
+                        SPACE_PAGE_TIMEOUT, MAX_IDLE_PAGES, EXTRACT_NEW_CARDS_JS, MORE_CARDS_JS,
+                        DOM_SCROLL_TIMEOUT)
+
+
+# Set by pause(); upload workers stop taking new files and in-flight uploads stop
+PAUSE_EVENT = threading.Event()
+# Configuration constants
+CONFIG_FILE = "loom_config.json"
+LOOM_COOKIES_FILE = "loom_cookies.json"
+TEMPORARY_DOWNLOAD_DIR = 'downloaded_videos'
+DOWNLOAD_CHUNK_SIZE = 10 * 1024 * 1024
+# Max downloaded-but-not-yet-uploading files in Download & Upload mode
+PIPELINE_QUEUE_DEPTH = 4
+# In-progress downloads; never shown in the upload list or uploaded
+PARTIAL_SUFFIX = '.part'
+os.makedirs(TEMPORARY_DOWNLOAD_DIR, exist_ok=True)
+
+# Set browser path for frozen executable
+if getattr(sys, 'frozen', False):
+    exe_path = os.path.dirname(sys.executable)
+    os.environ['PLAYWRIGHT_BROWSERS_PATH'] = os.path.join(exe_path, 'browsers')
+
+# Helper functions
+def list_ready_files():
+    """Completed downloads in TEMPORARY_DOWNLOAD_DIR (skips in-progress .part files)."""
+    return [f for f in os.listdir(TEMPORARY_DOWNLOAD_DIR) if not f.endswith(PARTIAL_SUFFIX)]
+
+def load_config():
+    config = {'folder_id': '', 'service_file': '', 'space': '', 'upload_workers': 1, 'download_workers': 4,
+              'upload_engine': 'browser', 'direct_upload_endpoint': '', 'direct_upload_finalize_url': '',
+              'browser_tmp_dir': '', 'block_resources': True,
+              'browser_memory_budget_mb': 0}
+    try:
+        if Path(CONFIG_FILE).exists():
+            with open(CONFIG_FILE, 'r') as f:
+                config.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading config: {e}")
+    return config
+
+def preflight_session(progress_queue):
+    """
+    Check the saved Loom session before a batch (one plain HTTP request, no
+    browser; cookie expiry only drives a warning). Returns False, after reporting it,
+    only when the session is definitely unusable.
+    """
+    status = check_session(LOOM_COOKIES_FILE)
+    if status.ok is False:
+        progress_queue.put(("error", status.reason))
+        progress_queue.put(("auth_expired", None))
+        return False
+    if status.ok is None:
+        print(f"[SESSION] {status.reason}; carrying on")
+    if status.expires_at and status.expires_at - time.time() < EXPIRY_WARNING:
+        remaining = max(0, status.expires_at - time.time()) / 60
+        print(f"[SESSION] Saved session expires in {remaining:.0f} minutes; it is refreshed from the browser as jobs run")
+    return True
+
+def use_config_file(path):
+    """Read settings from `path` instead of loom_config.json."""
+    global CONFIG_FILE
+    CONFIG_FILE = path
+
+def pause():
+    """Ask running uploads to stop after their current step."""
+    PAUSE_EVENT.set()
+
+def record_video(video_title, video_url, embed_code):
+    """Append a video to the ledger; the xlsx export is refreshed in batches."""
+    ledger = get_ledger()
+    ledger.add_video(video_title, video_url, embed_code)
+    try:
+        ledger.export_excel_if_stale()
+    except Exception as e:
+        print(f"Error exporting Excel: {e}")
+
+def update_embed_code(video_url, new_embed_code):
+    try:
+        return get_ledger().set_embed_code(video_url, new_embed_code) > 0
+    except Exception as e:
+        print(f"Error updating ledger: {e}")
+        return False
+
+def export_excel(progress_queue=None):
+    """Regenerate uploaded_videos.xlsx from the ledger."""
+    try:
+        get_ledger().export_excel()
+        return True
+    except Exception as e:
+        # Typically the workbook is open in Excel; the ledger still has everything
+        print(f"Error exporting Excel: {e}")
+        if progress_queue is not None:
+            progress_queue.put(("warning", f"Could not write {EXCEL_FILE}: {e}"))
+        return False
+
+
+# Video processing functions
+SHARE_BUTTON = 'button[data-testid="share-modal-button"]'
+SHARE_DIALOG = "dialog.css-1gw7q29[role='dialog']"
+EMBED_TAB = f"{SHARE_DIALOG} button.menu_shareTab_3H-:has-text('Embed')"
+
+def extract_embed_code(page, progress_queue, title):
+    try:
+        run_steps(page, [
+            Step("share button", selector=SHARE_BUTTON, timeout=20000, then=click(force=False)),
+            Step("embed tab", selector=EMBED_TAB, timeout=20000, then=click(force=False)),
+        ], label=f"share modal {title}")
+        try:
+            # Only "attached": thumbnail images are blocked, so the img may never get a size
+            run_steps(page, [Step("embed preview", selector='img[alt="Video thumbnail"]', state="attached",
+                                  timeout=5000)])
+        except StepTimeout:
+            # The first click sometimes lands before the tab is interactive
+            page.locator(EMBED_TAB).click()
+        run_steps(page, [
+            Step("copy embed code", selector='button.css-ask8uh:has-text("Copy embed code")', timeout=20000,
+                 then=click(force=False)),
+        ])
+        embed_code = page.evaluate("navigator.clipboard.readText()")
+        progress_queue.put(("embed_success", title, page.url, embed_code))
+        return embed_code
+    except Exception as e:
+        progress_queue.put(("embed_error", page.url, str(e)))
+        return None
+    
+
+
+# Tabs used by one batch extraction, all in the same pooled browser
+EMBED_TABS = 4
+
+def process_video_urls(pairs, progress_queue, tabs=EMBED_TABS, skip_recorded=True):
+    """
+    Extract embed codes for a list of (title, url) pairs in one pooled
+    browser, spreading them over up to `tabs` tabs: while one tab works
+    through the share modal the others are already loading their video.
+    Results stream back as "embed_success"/"embed_error" messages and are
+    written to the ledger. URLs that already have an embed code recorded are
+    skipped unless `skip_recorded` is False. Returns {url: embed_code}.
+    """
+    recorded = get_ledger().urls_with_embed() if skip_recorded else set()
+    todo = []
+    seen = set()
+    for title, url in pairs:
+        if url in recorded or url in seen:
+            continue
+        seen.add(url)
+        todo.append((title, url))
+    skipped = len(pairs) - len(todo)
+    if skipped:
+        print(f"[EMBED] Skipping {skipped} URLs with an embed code already recorded")
+    progress_queue.put(("total_embeds", len(todo)))
+    if not todo or not preflight_session(progress_queue):
+        return {}
+
+    def job(page):
+        results = {}
+        pending = deque(todo)
+        loading = deque()
+        tab_pages = [page] + [page.context.new_page() for _ in range(min(tabs, len(todo)) - 1)]
+
+        def load_next(tab):
+            # Start navigating and return straight away; the tab keeps loading in the background
+            while pending:
+                title, url = pending.popleft()
+                try:
+                    tab.goto(url, wait_until="commit")
+                    loading.append((tab, title, url))
+                    return
+                except Exception as e:
+                    progress_queue.put(("embed_error", url, str(e)))
+
+        try:
+            for tab in tab_pages:
+                load_next(tab)
+            done = 0
+            while loading:
+                tab, title, url = loading.popleft()
+                embed_code = None
+                try:
+                    run_steps(tab, [Step("open video", selector=SHARE_BUTTON, timeout=60000)], label=title)
+                    # Clipboard reads need the tab focused
+                    tab.bring_to_front()
+                    embed_code = extract_embed_code(tab, progress_queue, title)
+                except Exception as e:
+                    progress_queue.put(("embed_error", url, str(e)))
+                if embed_code:
+                    results[url] = embed_code
+                    update_embed_code(url, embed_code)
+                done += 1
+                progress_queue.put(("current_embed", done, title))
+                load_next(tab)
+        finally:
+            for tab in tab_pages[1:]:
+                tab.close()
+        return results
+
+    try:
+        return get_pool().run(job)
+    except Exception as e:
+        progress_queue.put(("error", f"Embed extraction failed: {e}"))
+        return {}
+
+def process_video_url(url, progress_queue, title):
+    return process_video_urls([(title, url)], progress_queue, tabs=1, skip_recorded=False).get(url)
+
+def extract_embed_codes(progress_queue, tabs=EMBED_TABS):
+    """
+    Read the embed code from Loom's share dialog for every ledger video that
+    has none yet, instead of deriving it from the URL.
+    """
+    pairs = [(title, url) for _, title, url, embed_code in get_ledger().rows() if url and not embed_code]
+    results = process_video_urls(pairs, progress_queue, tabs=tabs)
+    if results:
+        export_excel(progress_queue)
+    progress_queue.put(("status", f"Extracted embed codes for {len(results)} of {len(pairs)} videos"))
+    if len(results) < len(pairs):
+        progress_queue.put(("error", f"Could not extract embed codes for {len(pairs) - len(results)} videos"))
+    return results
+
+def crawl_space_api(page, crawl, progress_queue):
+    """
+    Page through the space by scrolling once per intercepted listing response,
+    until the listing API reports there are no further pages.
+    """
+    crawl.drain()
+    idle_pages = 0
+    while not crawl.finished and idle_pages < MAX_IDLE_PAGES:
+        try:
+            with page.expect_response(crawl.is_next_page, timeout=SPACE_PAGE_TIMEOUT):
+                page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        except PlaywrightTimeoutError:
+            pass
+        new = crawl.drain()
+        idle_pages = 0 if new else idle_pages + 1
+        progress_queue.put(("status", f"Loaded {len(crawl.videos)} videos..."))
+    return list(crawl.videos.values())
+
+def scrape_space_dom(page, progress_queue):
+    """
+    Fallback when no listing responses were recognised: scroll and read the
+    cards. Each round is a single evaluate that returns just the new cards as
+    plain records, so the IPC cost doesn't grow with the number of videos.
+    """
+    videos = {}
+    max_consecutive_no_new = 6
+    consecutive_no_new = 0
+
+    while consecutive_no_new < max_consecutive_no_new:
+        batch = page.evaluate(EXTRACT_NEW_CARDS_JS)
+        for record in batch['records']:
+            if not record['href'] or not record['title']:
+                print(f"Video {record['id']}: Missing URL or title.")
+                continue
+            videos[record['id']] = {'id': record['id'], 'title': record['title'], 'url': record['href']}
+        progress_queue.put(("status", f"Loaded {len(videos)} videos..."))
+
+        try:
+            # Wait for the scroll to render more cards instead of a fixed sleep
+            page.wait_for_function(MORE_CARDS_JS, arg=batch['total'], timeout=DOM_SCROLL_TIMEOUT)
+            consecutive_no_new = 0  # Reset if new videos are found
+        except PlaywrightTimeoutError:
+            consecutive_no_new += 1  # Increment if no new videos
+
+    # Pick up anything rendered by the last scroll
+    for record in page.evaluate(EXTRACT_NEW_CARDS_JS)['records']:
+        if record['href'] and record['title']:
+            videos[record['id']] = {'id': record['id'], 'title': record['title'], 'url': record['href']}
+    return list(videos.values())
+
+def sync_videos(progress_queue, full=False, space_url=None):
+    """
+    Add videos listed in the Loom space but missing from the ledger.
+
+    By default the crawl is incremental: it stops once it reaches a run of
+    videos already in the space index. `full=True` (or an index older than
+    FULL_SYNC_INTERVAL_DAYS) crawls the whole space and reconciles the index.
+    `space_url` defaults to the space saved in the config.
+    """
+    progress_queue.put(("status", "Starting video synchronization..."))
+    if not preflight_session(progress_queue):
+        return
+
+    space_url = (space_url or load_config().get('space', '')).strip()
+    if not space_url:
+        progress_queue.put(("error", "Please provide a Space URL"))
+        return
+
+    space_index = get_space_index()
+    full = full or space_index.full_sync_due(space_url)
+    known_ids = None if full else space_index.known_ids(space_url)
+
+    def job(page):
+        crawl = SpaceCrawl(known_ids=known_ids)
+        page.on("response", crawl.on_response)
+        progress_queue.put(("status", "Loading Loom space content..."))
+        page.goto(space_url, wait_until="domcontentloaded", timeout=120000)
+
+        page.wait_for_selector('article[data-videoid]', timeout=30000)
+        print('Site loaded')
+        videos = crawl_space_api(page, crawl, progress_queue)
+        if not videos:
+            # Scrolling stops when nothing new renders for a while, which doesn't prove it saw everything
+            print("[SYNC] No listing responses recognised, falling back to DOM scraping")
+            return scrape_space_dom(page, progress_queue), False
+        if crawl.caught_up:
+            print(f"[SYNC] Reached {crawl.known_run} already-indexed videos, stopping early")
+        elif crawl.has_next is not False:
+            print("[SYNC] Listing stopped before its last page; not reconciling the space index")
+        # Only a crawl that reached the listing's last page may replace the index
+        return videos, crawl.has_next is False
+
+    try:
+        videos, crawled_everything = get_pool().run(job)
+    except Exception as e:
+        progress_queue.put(("error", f"Sync failed: {str(e)}"))
+        return
+
+    removed = space_index.update(space_url, [v for v in videos if v.get('id')], full=crawled_everything)
+    if removed:
+        print(f"[SYNC] {removed} videos no longer listed in the space")
+    progress_queue.put(("status", f"Found {len(videos)} videos in space"))
+
+    existing_urls = get_ledger().urls()
+    existing_ids = {loom_video_id(url) for url in existing_urls} - {None}
+
+    new_entries = 0
+    for i, video in enumerate(videos, 1):
+        title, url = video['title'], video['url']
+        print(f"Video {i}: {title} - {url}")
+
+        if url not in existing_urls and (video.get('id') or loom_video_id(url)) not in existing_ids:
+            record_video(title, url, "")
+            new_entries += 1
+        else:
+            print(f"Video {i}: Duplicate URL.")
+
+    if new_entries:
+        export_excel(progress_queue)
+    progress_queue.put(("status", f"Sync complete! Added {new_entries} new videos"))
+
+def generate_embed_code(url):
+    if isinstance(url, str) and "/share/" in url:
+        video_id = url.split("/share/")[-1]
+        embed_url = f"https://www.loom.com/embed/{video_id}"
+        return (
+            '<div style="position: relative; padding-bottom: 56.25%; height: 0;">'
+            f'<iframe src="{embed_url}" frameborder="0" webkitallowfullscreen mozallowfullscreen allowfullscreen '
+            'style="position: absolute; top: 0; left: 0; width: 100%; height: 100%;"></iframe>'
+            '</div>'
+        )
+    return ""
+
+def generate_embed_codes(progress_queue):
+    """Bulk mode: fill in missing or stale embed codes in one pass over the ledger."""
+    try:
+        updated, unchanged = get_ledger().refresh_embed_codes(generate_embed_code)
+
+        if updated:
+            export_excel(progress_queue)
+        progress_queue.put(("complete", f"Embed codes generated for {updated} videos ({unchanged} already up to date)."))
+
+    except Exception as e:
+        progress_queue.put(("error", f"Embed code generation failed: {e}"))
+
+
+def run_download_upload_pipeline(folder_id, service_file, progress_queue, space_url=None,
+                                 upload_workers=None, download_workers=None):
+    """
+    Producer/consumer pipeline: Drive download workers hand each finished
+    file straight to the upload workers through a bounded queue, so uploads
+    start while the rest of the folder is still downloading. When the queue
+    is full, downloaders wait, which caps how much sits on disk.
+    """
+    # Before any download: with a dead session the whole run should fail in seconds
+    if not preflight_session(progress_queue):
+        return
+    ready_files = queue.Queue(maxsize=PIPELINE_QUEUE_DEPTH)
+    queued = set()
+    consumer = threading.Thread(target=upload_videos, args=(progress_queue, ready_files),
+                                kwargs={'space_url': space_url, 'workers': upload_workers,
+                                        'check_session': False}, daemon=True)
+    consumer.start()
+
+    def enqueue(filename):
+        while consumer.is_alive():
+            try:
+                ready_files.put(filename, timeout=1)
+                queued.add(filename)
+                return
+            except queue.Full:
+                continue
+
+    download_videos(folder_id, service_file, progress_queue, on_downloaded=enqueue, workers=download_workers)
+
+    # Leftovers from earlier runs are uploaded too, as in the sequential mode
+    for filename in list_ready_files():
+        if filename not in queued:
+            enqueue(filename)
+    enqueue(None)
+    consumer.join()
+
+# Function to fetch video files from Google Drive
+DRIVE_FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+DRIVE_VIDEO_EXTENSIONS = {'mp4', 'mov', 'avi', 'mkv', 'flv', 'wmv'}
+# Only what the pipeline reads; mimeType/fileExtension are needed for filtering
+DRIVE_LIST_FIELDS = "nextPageToken, files(id, name, mimeType, fileExtension, size, md5Checksum, modifiedTime)"
+
+def is_valid_video(file):
+    # Check if it's a Google Drive native video file
+    if file['mimeType'] == 'application/vnd.google-apps.video':
+        return True
+    # Check for standard video files
+    return (file['mimeType'].startswith('video/') and
+            file.get('fileExtension', '').lower() in DRIVE_VIDEO_EXTENSIONS)
+
+def iter_gdrive_videos(service_factory, folder_id, recursive=True, max_workers=4):
+    """
+    Yield video files under a Drive folder as each result page arrives.
+
+    Follows nextPageToken and, when `recursive` is set, walks subfolders
+    breadth-first with up to `max_workers` folders listed concurrently.
+    Each file carries a 'folder_path' key: its subfolder path relative to
+    `folder_id` ("" at the top level).
+    `service_factory` must return a Drive client usable from the calling thread.
+    """
+    # Build the query with explicit MIME type checks
+    def folder_query(parent_id):
+        return (
+            f"'{parent_id}' in parents and ("
+            "mimeType contains 'video/' or "
+            "mimeType = 'application/vnd.google-apps.video'"
+            + (f" or mimeType = '{DRIVE_FOLDER_MIME_TYPE}'" if recursive else "")
+            + ")"
+        )
+
+    pages = queue.Queue()
+
+    def list_folder(parent_id, folder_path):
+        try:
+            drive_service = service_factory()
+            page_token = None
+            while True:
+                results = drive_service.files().list(
+                    q=folder_query(parent_id),
+                    fields=DRIVE_LIST_FIELDS,
+                    pageSize=1000,
+                    pageToken=page_token
+                ).execute()
+                pages.put(("page", (folder_path, results.get('files', []))))
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    break
+        except Exception as e:
+            pages.put(("error", e))
+        finally:
+            pages.put(("done", parent_id))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="drive-list") as executor:
+        executor.submit(list_folder, folder_id, "")
+        pending = 1
+        seen_folders = {folder_id}
+        while pending:
+            kind, payload = pages.get()
+            if kind == "done":
+                pending -= 1
+            elif kind == "error":
+                raise payload
+            else:
+                folder_path, files = payload
+                for file in files:
+                    if file['mimeType'] == DRIVE_FOLDER_MIME_TYPE:
+                        if file['id'] not in seen_folders:
+                            seen_folders.add(file['id'])
+                            subfolder_path = f"{folder_path}/{file['name']}" if folder_path else file['name']
+                            executor.submit(list_folder, file['id'], subfolder_path)
+                            pending += 1
+                    elif is_valid_video(file):
+                        file['folder_path'] = folder_path
+                        yield file
+
+def get_gdrive_videos(drive_service, folder_id):
+    """Fetch video files from Google Drive folder (all pages, including subfolders)"""
+    return list(iter_gdrive_videos(lambda: drive_service, folder_id, max_workers=1))
+
+def download_video(drive_service, file_id, file_name, on_progress=None, expected_size=None, expected_md5=None):
+    """
+    Download a video with progress reporting, resuming any earlier attempt.
+
+    Bytes go to `<name>.part` and are fetched with HTTP Range requests from
+    the current end of that file. Only once the size and md5Checksum Drive
+    reported check out is the file renamed into place, so nothing else ever
+    sees a half-written video.
+    """
+    file_path = os.path.join(TEMPORARY_DOWNLOAD_DIR, file_name)
+    part_path = file_path + PARTIAL_SUFFIX
+    expected_size = int(expected_size) if expected_size else None
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if expected_size is not None and offset > expected_size:
+        offset = 0  # Drive's copy changed under us, start over
+    md5 = hashlib.md5()
+    if offset:
+        print(f"[DOWNLOAD] Resuming {file_name} from byte {offset}")
+        with open(part_path, 'rb') as fh:
+            for block in iter(lambda: fh.read(1024 * 1024), b''):
+                md5.update(block)
+
+    request = drive_service.files().get_media(fileId=file_id)
+    with open(part_path, 'r+b' if offset else 'wb') as fh:
+        fh.seek(offset)
+        fh.truncate()
+        while expected_size is None or offset < expected_size:
+            headers = {'Range': f'bytes={offset}-{offset + DOWNLOAD_CHUNK_SIZE - 1}'}
+            response, content = request.http.request(request.uri, headers=headers)
+            if response.status == 416:
+                break  # Nothing past `offset`: the part file is already complete
+            if response.status not in (200, 206):
+                raise HttpError(response, content, uri=request.uri)
+            if response.status == 200 and offset:
+                # Server ignored the Range header and sent the whole file
+                fh.seek(0)
+                fh.truncate()
+                md5 = hashlib.md5()
+                offset = 0
+            fh.write(content)
+            md5.update(content)
+            offset += len(content)
+
+            content_range = response.get('content-range', '')
+            if '/' in content_range and content_range.rsplit('/', 1)[1].isdigit():
+                expected_size = int(content_range.rsplit('/', 1)[1])
+            if on_progress:
+                # Report progress percentage and bytes so far for this file
+                percent = int(offset * 100 / expected_size) if expected_size else 0
+                on_progress(percent, offset)
+            if response.status == 200 or not content:
+                break
+
+    if expected_size is not None and offset != expected_size:
+        raise IOError(f"Incomplete download of {file_name}: {offset} of {expected_size} bytes")
+    if expected_md5 and md5.hexdigest() != expected_md5:
+        os.remove(part_path)
+        raise IOError(f"Checksum mismatch for {file_name}, partial download discarded")
+    os.replace(part_path, file_path)
+    return file_path
+
+def get_thread_drive_service(service_file):
+    """
+    Return a Drive client owned by the calling thread. The httplib2 transport
+    under googleapiclient is not thread-safe, so download workers never share
+    one; credentials and the discovery document are shared process-wide.
+    """
+    return get_drive_factory(service_file).service()
+
+
+class DownloadProgress:
+    """Thread-safe byte counters for a folder download, for aggregate speed reporting."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total_bytes = 0
+        self.total_files = 0
+        self.file_bytes = {}
+        self.files_done = 0
+        self.start_time = time.time()
+
+    def add(self, video):
+        """Account for a file discovered while the folder is still being listed."""
+        with self.lock:
+            self.total_bytes += int(video.get('size') or 0)
+            self.total_files += 1
+
+    def update(self, file_id, downloaded):
+        with self.lock:
+            self.file_bytes[file_id] = downloaded
+            return self._snapshot()
+
+    def finish(self, file_id):
+        with self.lock:
+            self.files_done += 1
+            return self._snapshot()
+
+    def snapshot(self):
+        with self.lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        done_bytes = sum(self.file_bytes.values())
+        elapsed = max(time.time() - self.start_time, 0.1)
+        speed_mbs = done_bytes / 1_000_000 / elapsed
+        percent = int(done_bytes * 100 / self.total_bytes) if self.total_bytes else 0
+        return min(percent, 100), speed_mbs, done_bytes
+
+
+def download_videos(folder_id, service_file, progress_queue, on_downloaded=None, workers=None):
+    """
+    Download the folder's videos on a bounded pool of worker threads. Files
+    are queued as soon as their listing page arrives, so downloads overlap
+    with enumerating large or nested folders. `on_downloaded(filename)` is
+    called from the worker thread as each file lands; if it blocks, that
+    worker stops taking new files (back-pressure for pipelined uploads).
+    """
+    worker_count = max(1, int(workers or load_config()['download_workers']))
+    progress = DownloadProgress()
+    manifest = get_manifest()
+    skipped_files = 0
+    skipped_bytes = 0
+
+    def download_one(video):
+        name = video['local_name']
+        progress_queue.put(("download", f"Starting download: {name}", progress.update(video['id'], 0)[0]))
+
+        def progress_callback(percent, downloaded):
+            """Multiplex this file's progress into the folder-wide message."""
+            total_percent, speed_mbs, _ = progress.update(video['id'], downloaded)
+            progress_queue.put((
+                "download",
+                f"Downloading: {name} ({percent}%) | {progress.files_done}/{progress.total_files} files, "
+                f"{speed_mbs:.2f} MB/s",
+                total_percent
+            ))
+
+        part_path = os.path.join(TEMPORARY_DOWNLOAD_DIR, name) + PARTIAL_SUFFIX
+        if not manifest.begin_download(video) and os.path.exists(part_path):
+            # Left by a download of an older version of the file: resuming it could only fail the md5 check
+            print(f"[DOWNLOAD] {name} changed on Drive since its partial download, starting over")
+            os.remove(part_path)
+
+        drive_service = get_thread_drive_service(service_file)
+        download_video(drive_service, video['id'], name, progress_callback,
+                       expected_size=video.get('size'), expected_md5=video.get('md5Checksum'))
+
+        manifest.record_download(video, name)
+        if video.get('size'):
+            progress.update(video['id'], int(video['size']))
+        total_percent, speed_mbs, _ = progress.finish(video['id'])
+        progress_queue.put((
+            "download",
+            f"Downloaded: {name} ✔ | {progress.files_done}/{progress.total_files} files, {speed_mbs:.2f} MB/s",
+            total_percent
+        ))
+        if on_downloaded:
+            on_downloaded(name)
+
+    with ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix="drive") as executor:
+        futures = {}
+        try:
+            for video in iter_gdrive_videos(lambda: get_thread_drive_service(service_file), folder_id):
+                if manifest.is_unchanged(video, TEMPORARY_DOWNLOAD_DIR):
+                    # Same md5/modifiedTime as a file we already fetched or uploaded
+                    skipped_files += 1
+                    skipped_bytes += int(video.get('size') or 0)
+                    continue
+                # Unique per Drive file id, so same-named files never share a .part file. Claimed
+                # here in listing order, so top-level files keep their plain names
+                video['local_name'] = manifest.claim_local_name(video)
+                progress.add(video)
+                futures[executor.submit(download_one, video)] = video
+        except Exception as e:
+            progress_queue.put(("error", f"Listing Drive folder failed: {e}"))
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                progress_queue.put(("error", f"Download failed for {futures[future]['local_name']}: {e}"))
+
+    _, speed_mbs, done_bytes = progress.snapshot()
+    progress_queue.put((
+        "download",
+        f"Downloaded {progress.files_done}/{progress.total_files} files "
+        f"({done_bytes / 1_000_000:.1f} MB at {speed_mbs:.2f} MB/s), "
+        f"skipped {skipped_files} unchanged ({skipped_bytes / 1_000_000:.1f} MB)",
+        100 if futures else 0
+    ))
+
+    # Update UI with downloaded files
+    progress_queue.put(("populate_listbox", list_ready_files())) 
+
+
+UPLOAD_PAUSED = "paused"
+# Stop trying the direct engine for a batch after this many fallbacks
+DIRECT_FAILURES_TO_DISABLE = 3
+
+
+def upload_file(page, file_path, filename, space_url, progress_queue, worker_id=None):
+    """
+    Drive the Loom "Add video" -> "Upload a video" -> Uppy flow for one file on
+    a pool page. Returns the share URL, or UPLOAD_PAUSED if the user paused.
+    Progress is reported under `worker_id` (default: the pool slot's id).
+    """
+    processing_timeout = 180000
+    pause_check_interval = 5
+    stuck_threshold = 60
+    max_upload_time = 600
+
+    if worker_id is None:
+        worker_id = current_worker_id()
+
+    def report(text, percent):
+        progress_queue.put(("upload", text, percent, worker_id))
+
+    file_size = os.path.getsize(file_path)
+    page.evaluate("() => { delete window.navigator.webdriver; }")
+    # Installed before navigating so Uppy's status bar is observed from the start
+    monitor = UppyMonitor(page)
+
+    def open_space(page):
+        page.goto(space_url, wait_until="domcontentloaded", timeout=120000)
+        if "/login" in page.url or "/signup" in page.url:
+            raise AuthExpired(f"Redirected to {page.url}")
+
+    def choose_upload(page, option):
+        option.click(force=True)
+        report(f"Initiating upload of {filename}...", 0)
+
+    report(f"Opening Loom workspace for {filename}...", 0)
+    # Each step waits for what the next action needs instead of fixed sleeps
+    run_steps(page, [
+        Step("open space", trigger=open_space, selector='button:has-text("Add video")', then=click()),
+        Step("upload option", selector='li[role="option"]:has-text("Upload a video")', then=choose_upload),
+        Step("file chooser", file_chooser=True, trigger=lambda page: page.keyboard.press(" "),
+             then=lambda page, chooser: chooser.set_files(file_path)),
+        Step("file staged", selector="text=Upload 1 file"),
+        Step("start upload", selector="button.uppy-StatusBar-actionBtn--upload", then=click()),
+    ], label=filename)
+
+    # Upload progress monitoring: events are pushed from the page by UppyMonitor
+    previous_percentage = 0
+    previous_time = time.time()
+    last_progress_update = time.time()
+    upload_start_time = time.time()
+    complete = False
+
+    while not complete:
+        if PAUSE_EVENT.is_set():
+            return UPLOAD_PAUSED
+
+        # Check total upload time
+        elapsed = time.time() - upload_start_time
+        if elapsed > max_upload_time:
+            raise TimeoutError(f"Upload for {filename} exceeded maximum time of {max_upload_time} seconds")
+
+        # Blocks until the next event; wakes up periodically only to honour Pause
+        events = monitor.next_events(int(min(pause_check_interval, max_upload_time - elapsed) * 1000) or 1)
+        for event in events:
+            if event['kind'] == 'progress':
+                current_percentage = event['percent']
+                if current_percentage != previous_percentage:
+                    now = time.time()
+                    if event.get('total'):
+                        bytes_uploaded_now = (current_percentage - previous_percentage) / 100.0 * event['total']
+                    else:
+                        bytes_uploaded_now = (current_percentage - previous_percentage) / 100.0 * file_size
+                    delta_time = now - previous_time or 0.1
+                    speed_mbs = (bytes_uploaded_now / 1_000_000) / delta_time
+
+                    previous_percentage = current_percentage
+                    previous_time = now
+                    last_progress_update = now
+
+                    report(f"Uploading {filename}: {current_percentage}% ({speed_mbs:.2f} MB/s)", current_percentage)
+            elif event['kind'] == 'complete':
+                report(f"{filename}: 100% Complete", 100)
+                complete = True
+                break
+            elif event['kind'] == 'rejected':
+                raise FileRejected(f"Uppy rejected {filename}: {event.get('text')}")
+            elif event['kind'] == 'error':
+                raise classify_uppy_error(event.get('text'), f"Uppy reported an error for {filename}: {event.get('text')}")
+            else:
+                print(f"[UPPY] {filename}: {event.get('text')}")
+
+        if not complete and time.time() - last_progress_update > stuck_threshold:
+            raise UploadStalled(f"Upload stuck at {previous_percentage}% for over {stuck_threshold} seconds")
+
+    # Extract URL
+    report(f"Finished uploading {filename}. Extracting URL..", 0)
+    try:
+        results = run_steps(page, [
+            Step("share link", selector=".uppy-Dashboard-Item.is-complete .uppy-Dashboard-Item-previewLink",
+                 timeout=processing_timeout),
+        ], label=filename)
+        return results["share link"].get_attribute("href")
+    except StepTimeout as e:
+        record_video(filename, "", "")
+        print(f"Timeout extracting URL for {filename}: {e}")
+        raise
+
+
+def upload_videos(progress_queue, file_queue=None, retry_policy=None, space_url=None, workers=None,
+                  check_session=True):
+    """
+    Upload downloaded videos to `space_url` with `workers` concurrent
+    workers (both default to the saved config). `check_session=False`
+    skips the session pre-flight when the caller already ran it.
+
+    By default every file currently in TEMPORARY_DOWNLOAD_DIR is uploaded.
+    When `file_queue` is given (pipelined mode) workers instead consume
+    filenames from it as they arrive, until a None sentinel is received.
+    Failures are classified and retried according to `retry_policy`.
+    """
+    PAUSE_EVENT.clear()
+
+    retry_policy = retry_policy or RetryPolicy()
+    breaker = CircuitBreaker()
+
+    if file_queue is None:
+        files_to_upload = list_ready_files()
+        progress_queue.put(("populate_listbox", files_to_upload))
+
+        if not files_to_upload:
+            progress_queue.put(("complete", None))
+            return
+
+    if check_session and not preflight_session(progress_queue):
+        return
+
+    try:
+        cookies = load_session_cookies(LOOM_COOKIES_FILE)
+    except Exception as e:
+        progress_queue.put(("error", f"Could not load cookies file: {e}"))
+        progress_queue.put(("Could not log in", None))
+        return
+
+    config = load_config()
+    direct_endpoint = config.get('direct_upload_endpoint', '').strip()
+    use_direct = config.get('upload_engine') == 'direct' and bool(direct_endpoint)
+    if config.get('upload_engine') == 'direct' and not direct_endpoint:
+        print("[DIRECT] upload_engine is 'direct' but no direct_upload_endpoint is set, using Chromium")
+    # One uploader (and keep-alive connection) per worker thread
+    direct_local = threading.local()
+    # tus upload URL per file, so a retry resumes from the server's offset
+    direct_sessions = {}
+    direct_failures = []
+
+    space_url = (space_url or config.get('space', '')).strip()
+    worker_count = max(1, int(workers or config['upload_workers']))
+    pool = get_pool()
+    pool.ensure_size(worker_count)
+
+    # Shared work queue: every worker pulls the next file as soon as it is free
+    if file_queue is None:
+        file_queue = queue.Queue()
+        for filename in files_to_upload:
+            file_queue.put(filename)
+        file_queue.put(None)
+        total = len(files_to_upload)
+        worker_count = min(worker_count, total)
+    else:
+        total = 0  # unknown up front while downloads are still running
+    finished = []
+    finished_lock = threading.Lock()
+    paused = threading.Event()
+    aborted = threading.Event()
+
+    def mark_finished(filename):
+        with finished_lock:
+            finished.append(filename)
+            done = len(finished)
+        progress_queue.put(("batch_progress", done, total))
+
+    def wait_out_breaker():
+        remaining = breaker.remaining()
+        if remaining:
+            progress_queue.put(("status", f"Loom looks unavailable, pausing uploads for {remaining:.0f}s..."))
+        while breaker.remaining() and not PAUSE_EVENT.is_set() and not aborted.is_set():
+            time.sleep(min(breaker.remaining(), 1))
+
+    def direct_uploader():
+        if not hasattr(direct_local, "uploader"):
+            direct_local.uploader = DirectUploader(direct_endpoint, cookies,
+                                                   config.get('direct_upload_finalize_url') or None)
+        return direct_local.uploader
+
+    def upload_direct(file_path, filename, worker_id):
+
+        def on_progress(percent, mbps):
+            if PAUSE_EVENT.is_set():
+                raise UploadCancelled(filename)
+            progress_queue.put(("upload", f"Uploading {filename}: {percent}% ({mbps:.1f} MB/s, direct)",
+                                percent, worker_id))
+
+        def on_created(upload_url):
+            direct_sessions[filename] = upload_url
+
+        try:
+            return direct_uploader().upload(file_path, filename, on_progress=on_progress,
+                                            upload_url=direct_sessions.get(filename),
+                                            on_created=on_created, space_url=space_url)
+        except UploadCancelled:
+            return UPLOAD_PAUSED
+
+    def upload_once(file_path, filename, worker_id):
+        """
+        Direct HTTP engine when configured, falling back to the Chromium flow.
+        Both report progress under the upload worker's number, so a fallback
+        doesn't show up as a second worker.
+        """
+        if use_direct and len(direct_failures) < DIRECT_FAILURES_TO_DISABLE:
+            try:
+                return upload_direct(file_path, filename, worker_id)
+            except AuthExpired:
+                raise
+            except Exception as e:
+                direct_failures.append(filename)
+                direct_sessions.pop(filename, None)
+                print(f"[DIRECT] {filename}: {e}; falling back to Chromium")
+                if len(direct_failures) == DIRECT_FAILURES_TO_DISABLE:
+                    print(f"[DIRECT] {DIRECT_FAILURES_TO_DISABLE} direct failures, using Chromium for the rest of the batch")
+        return pool.run(upload_file, file_path, filename, space_url, progress_queue, worker_id)
+
+    def upload_with_retries(filename, worker_id):
+        file_path = os.path.join(TEMPORARY_DOWNLOAD_DIR, filename)
+        if not os.path.isfile(file_path):
+            return
+
+        attempt = 0
+        while True:
+            wait_out_breaker()
+            if PAUSE_EVENT.is_set() or aborted.is_set():
+                return
+            attempt += 1
+            try:
+                video_url = upload_once(file_path, filename, worker_id)
+                if video_url == UPLOAD_PAUSED:
+                    paused.set()
+                    return
+                breaker.record_success()
+
+                # The embed is derived from the share URL, no need to rescan the ledger
+                embed_code = generate_embed_code(video_url)
+                record_video(filename, video_url, embed_code)
+                get_manifest().record_upload(filename, video_url)
+
+                progress_queue.put(("add_video", filename, video_url, embed_code))
+
+
+                direct_sessions.pop(filename, None)
+                os.remove(file_path)
+                progress_queue.put(("remove_file", filename))
+                return
+
+            except Exception as e:
+                category = classify(e)
+                print(f"Upload of {filename} failed ({category}) on attempt {attempt}: {e}")
+
+                if category == AUTH_EXPIRED:
+                    # Every other file would fail the same way
+                    aborted.set()
+                    progress_queue.put(("error", "Loom session has expired. Please log in again."))
+                    progress_queue.put(("auth_expired", None))
+                    return
+                if category != FILE_REJECTED and breaker.record_failure():
+                    print(f"[RETRY] {breaker.threshold} consecutive failures, opening circuit breaker")
+
+                if not retry_policy.should_retry(category, attempt):
+                    reason = "it was rejected by Loom" if category == FILE_REJECTED else f"{attempt} failed attempts ({category})"
+                    # An error, not a warning: the file was never uploaded (and the CLI's exit status counts errors)
+                    progress_queue.put(("error", f"Skipped {filename} after {reason}: {e}"))
+                    progress_queue.put(("upload", f"Skipped {filename} ({category})", 0))
+                    return
+
+                delay = retry_policy.delay(attempt)
+                print(f"[RETRY] Retrying {filename} in {delay:.0f}s")
+                deadline = time.time() + delay
+                while time.time() < deadline and not PAUSE_EVENT.is_set() and not aborted.is_set():
+                    time.sleep(min(deadline - time.time(), 1))
+
+    def worker(worker_id):
+        while not PAUSE_EVENT.is_set() and not paused.is_set() and not aborted.is_set():
+            try:
+                filename = file_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if filename is None:
+                file_queue.put(None)  # let the other workers see the sentinel too
+                return
+            upload_with_retries(filename, worker_id)
+            if not paused.is_set():
+                mark_finished(filename)
+
+    workers = [threading.Thread(target=worker, args=(n + 1,), name=f"upload-{n + 1}", daemon=True)
+               for n in range(worker_count)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+
+    print(f"[POOL] {pool.stats_text()}")
+    if use_direct:
+        print(f"[DIRECT] {len(direct_failures)} file(s) fell back to Chromium")
+    export_excel(progress_queue)
+    if PAUSE_EVENT.is_set() or paused.is_set():
+        progress_queue.put(("pausing", None))
+        return
+    if aborted.is_set():
+        return
+    progress_queue.put(("complete", None))
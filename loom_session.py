@@ -0,0 +1,133 @@
+"""
+Cheap checks on the saved Loom session.
+
+Before a batch, `check_session` makes one plain HTTPS request to a
+logged-in Loom page (no browser). A redirect to the login page means the
+session is dead and the batch should fail in seconds rather than after a
+round of browser timeouts. Network trouble is reported as "unknown" and
+doesn't block the batch. Cookie expiry dates only feed the "expires soon"
+warning: loom.com also carries short-lived third-party cookies (Stripe,
+Intercom) whose names look like session cookies, so they can't decide
+whether the login is still valid.
+
+The session file holds a Playwright storage state (cookies plus per-origin
+localStorage), which seeds non-persistent browser contexts directly. Older
+files holding a bare cookie list are still accepted. `save_session` writes a
+live context's state back, so a long batch keeps a fresh session on disk.
+"""
+from direct_upload import cookie_header, USER_AGENT
+import http.client
+import threading
+import json
+import os
+
+
+LOOM_COOKIES_FILE = "loom_cookies.json"
+LOOM_HOST = "www.loom.com"
+SESSION_CHECK_PATH = "/looms/videos"
+SESSION_CHECK_TIMEOUT = 10
+# Cookie names that carry the login (anything else on loom.com is preferences/analytics)
+AUTH_COOKIE_HINTS = ("sid", "session", "auth", "token")
+# Third-party cookies set on loom.com whose names match the hints anyway
+THIRD_PARTY_COOKIE_PREFIXES = ("__stripe", "intercom-", "_ga", "_gid", "ajs_", "_hj", "amplitude", "_fs", "mp_")
+# Warn when the session will expire within this many seconds
+EXPIRY_WARNING = 60 * 60
+# Write the live session back to disk at most this often during a batch
+SESSION_REFRESH_INTERVAL = 30 * 60
+
+_save_lock = threading.Lock()
+
+
+class SessionStatus:
+    """`ok` is True/False, or None when the check could not reach Loom."""
+
+    def __init__(self, ok, reason, expires_at=None):
+        self.ok = ok
+        self.reason = reason
+        self.expires_at = expires_at
+
+    def __repr__(self):
+        return f"SessionStatus(ok={self.ok}, reason={self.reason!r})"
+
+
+def auth_cookies(cookies):
+    loom = [c for c in cookies if "loom.com" in c.get("domain", "")
+            and not c.get("name", "").lower().startswith(THIRD_PARTY_COOKIE_PREFIXES)]
+    hinted = [c for c in loom if any(hint in c.get("name", "").lower() for hint in AUTH_COOKIE_HINTS)]
+    return hinted or loom
+
+
+def session_expiry(cookies):
+    """
+    When the saved login runs out at the latest (epoch seconds): the last
+    expiry among the auth cookies, None for session-only cookies. Only an
+    estimate for warnings; whichever cookie really holds the login, it
+    can't outlive this.
+    """
+    expiries = [c["expires"] for c in auth_cookies(cookies) if c.get("expires", -1) not in (None, -1)]
+    return max(expiries) if expiries else None
+
+
+def load_storage_state(cookies_file=LOOM_COOKIES_FILE):
+    """The saved session as a storage_state dict, whichever format the file is in."""
+    with open(cookies_file, "r") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        # Cookie list written by older versions of the login flow
+        return {"cookies": data, "origins": []}
+    return {"cookies": data.get("cookies", []), "origins": data.get("origins", [])}
+
+
+def load_session_cookies(cookies_file=LOOM_COOKIES_FILE):
+    return load_storage_state(cookies_file)["cookies"]
+
+
+def check_session(cookies_file=LOOM_COOKIES_FILE, timeout=SESSION_CHECK_TIMEOUT):
+    if not os.path.exists(cookies_file):
+        return SessionStatus(False, f"No {cookies_file} found. Please log in first.")
+    try:
+        cookies = load_session_cookies(cookies_file)
+    except Exception as e:
+        return SessionStatus(False, f"Could not read {cookies_file}: {e}")
+    if not auth_cookies(cookies):
+        return SessionStatus(False, "No Loom cookies saved. Please log in again.")
+
+    # Expired cookies are left out of the header, so the probe below sees what Loom will see
+    expires_at = session_expiry(cookies)
+    conn = http.client.HTTPSConnection(LOOM_HOST, timeout=timeout)
+    try:
+        conn.request("GET", SESSION_CHECK_PATH, headers={
+            "Cookie": cookie_header(cookies, LOOM_HOST),
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html",
+        })
+        response = conn.getresponse()
+        response.read(0)
+        location = response.getheader("Location") or ""
+    except (OSError, http.client.HTTPException) as e:
+        return SessionStatus(None, f"Could not reach Loom to check the session: {e}", expires_at)
+    finally:
+        conn.close()
+
+    if response.status in (401, 403) or (300 <= response.status < 400
+                                          and ("/login" in location or "/signup" in location)):
+        return SessionStatus(False, "Loom session has expired. Please log in again.", expires_at)
+    if response.status == 200:
+        return SessionStatus(True, "Loom session is valid", expires_at)
+    return SessionStatus(None, f"Unexpected HTTP {response.status} checking the Loom session", expires_at)
+
+
+def save_session(context, cookies_file=LOOM_COOKIES_FILE):
+    """
+    Persist a live context's storage state (atomically). Returns the new
+    expiry, or None without writing if the context holds no Loom login.
+    """
+    state = context.storage_state()
+    if not auth_cookies(state["cookies"]):
+        return None
+    with _save_lock:
+        tmp_path = cookies_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, cookies_file)
+    return session_expiry(state["cookies"])
@@ -0,0 +1,280 @@
+"""
+Helpers for crawling a Loom space listing.
+
+The space page paginates by fetching JSON as you scroll. Rather than sleeping
+and re-counting DOM cards, sync listens to those responses and pulls video
+ids, titles and URLs straight out of them, scrolling again as soon as the
+previous page has arrived and stopping when the API reports no more pages.
+"""
+from urllib.parse import urlsplit
+import threading
+import json
+import time
+import os
+import re
+
+
+LOOM_SHARE_URL = "https://www.loom.com/share/{}"
+LOOM_VIDEO_ID = re.compile(r"^[0-9a-f]{32}$")
+# How long to wait for the next page of results after a scroll
+SPACE_PAGE_TIMEOUT = 15000
+# Safety net if the page stops answering without ever saying it is done
+MAX_IDLE_PAGES = 5
+
+SPACE_INDEX_FILE = "space_index.json"
+# Incremental sync stops after this many already-indexed videos in a row
+KNOWN_RUN_TO_STOP = 20
+# Force a full crawl if the last one is older than this
+FULL_SYNC_INTERVAL_DAYS = 7
+
+# One roundtrip per scroll for the DOM fallback: returns only the cards not
+# returned by an earlier call (tracked in-page by video id, which also copes
+# with virtualised lists) as plain records, then scrolls for the next batch.
+EXTRACT_NEW_CARDS_JS = """
+() => {
+    const seen = window.__loomSyncSeen || (window.__loomSyncSeen = new Set());
+    const cards = document.querySelectorAll('article[data-videoid]');
+    const records = [];
+    for (const card of cards) {
+        const id = card.getAttribute('data-videoid');
+        if (!id || seen.has(id)) continue;
+        seen.add(id);
+        const link = card.querySelector('a.video-card_videoCardLink_37D');
+        records.push({
+            id: id,
+            href: link ? link.getAttribute('href') : null,
+            title: link ? (link.getAttribute('aria-label') || '').replace('Open video: ', '') : null,
+        });
+    }
+    window.scrollTo(0, document.body.scrollHeight);
+    return {total: cards.length, records: records};
+}
+"""
+# Resolves as soon as the page renders more cards than `count`
+MORE_CARDS_JS = "count => document.querySelectorAll('article[data-videoid]').length > count"
+# Give up on a scroll producing new cards after this long
+DOM_SCROLL_TIMEOUT = 8000
+# Spaces, folders and members carry 32-hex ids and names too; without a
+# __typename, a record only counts as a video if it has one of these
+VIDEO_ONLY_FIELDS = ("share_url", "shareUrl", "duration", "durationMs", "video_duration", "playable_duration")
+NOT_VIDEO_TYPENAMES = ("Folder", "Space", "Connection", "Edge")
+
+
+def loom_video_id(url):
+    """Return the 32-hex video id from a Loom share/embed URL (or None)."""
+    if not isinstance(url, str):
+        return None
+    for marker in ("/share/", "/embed/"):
+        if marker in url:
+            candidate = url.split(marker, 1)[1].split("?")[0].split("/")[0]
+            if LOOM_VIDEO_ID.match(candidate):
+                return candidate
+    return None
+
+
+def is_listing_response(response):
+    """Cheap pre-filter (no body read) for XHR/fetch JSON coming from Loom."""
+    try:
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return False
+        if "loom.com" not in response.url or not response.ok:
+            return False
+        return "json" in (response.headers.get("content-type") or "")
+    except Exception:
+        return False
+
+
+def listing_signature(response):
+    """
+    What identifies the request behind a listing response: its URL path plus,
+    for GraphQL, the operation name(s). Loom's API answers many unrelated
+    queries on the same endpoint, so the path alone isn't enough.
+    """
+    try:
+        request = response.request
+        path = urlsplit(response.url).path
+        body = request.post_data_json if request.method == "POST" else None
+    except Exception:
+        return None
+    operations = [item.get("operationName") for item in (body if isinstance(body, list) else [body])
+                  if isinstance(item, dict)]
+    return path, tuple(op for op in operations if op)
+
+
+def _is_video(node):
+    typename = node.get("__typename")
+    if typename:
+        return "Video" in typename and not any(word in typename for word in NOT_VIDEO_TYPENAMES)
+    return any(node.get(field) is not None for field in VIDEO_ONLY_FIELDS)
+
+
+def _walk(node, videos, state):
+    if isinstance(node, dict):
+        video_id = node.get("id")
+        title = node.get("name") or node.get("title")
+        if (isinstance(video_id, str) and LOOM_VIDEO_ID.match(video_id)
+                and isinstance(title, str) and _is_video(node)):
+            url = node.get("share_url") or node.get("shareUrl") or LOOM_SHARE_URL.format(video_id)
+            videos.append({"id": video_id, "title": title, "url": url})
+
+        page_info = node.get("pageInfo")
+        if isinstance(page_info, dict) and "hasNextPage" in page_info:
+            state["has_next"] = bool(page_info["hasNextPage"])
+        for key in ("has_more", "hasMore", "has_next_page"):
+            if isinstance(node.get(key), bool):
+                state["has_next"] = node[key]
+
+        for value in node.values():
+            if isinstance(value, (dict, list)):
+                _walk(value, videos, state)
+    elif isinstance(node, list):
+        for value in node:
+            _walk(value, videos, state)
+
+
+def parse_space_page(data):
+    """
+    Extract `{id, title, url}` records (in listing order) and the pagination
+    flag from one JSON payload. `has_next` is None if the payload says
+    nothing about pagination.
+    """
+    videos = []
+    state = {"has_next": None}
+    _walk(data, videos, state)
+    return videos, state["has_next"]
+
+
+class SpaceCrawl:
+    """
+    Accumulates videos from intercepted listing responses, in first-seen order.
+
+    With `known_ids` set (incremental sync), `known_run` counts how many
+    already-indexed videos have been seen in a row; since the listing is
+    newest-first, a long run means everything older is known too.
+    """
+
+    def __init__(self, known_ids=None, stop_after_known=KNOWN_RUN_TO_STOP):
+        self.videos = {}
+        self.pending = []
+        self.has_next = None
+        self.pages = 0
+        self.known_ids = known_ids
+        self.stop_after_known = stop_after_known
+        self.known_run = 0
+        # Signatures of the requests that actually returned videos
+        self.listing_signatures = set()
+
+    def is_next_page(self, response):
+        """
+        Wait predicate for the next listing page. Until a listing has been
+        recognised any Loom JSON may be it; after that, only responses to the
+        same request count, so unrelated XHRs can't end a scroll round early.
+        """
+        if not is_listing_response(response):
+            return False
+        return not self.listing_signatures or listing_signature(response) in self.listing_signatures
+
+    def on_response(self, response):
+        # Called from page.on("response"): only queue it, bodies are read by drain()
+        if is_listing_response(response):
+            self.pending.append(response)
+
+    def drain(self):
+        """Parse queued responses; returns the number of new videos found."""
+        new = 0
+        while self.pending:
+            response = self.pending.pop(0)
+            try:
+                data = response.json()
+            except Exception:
+                continue
+            videos, has_next = parse_space_page(data)
+            if videos:
+                self.pages += 1
+                self.listing_signatures.add(listing_signature(response))
+            if has_next is not None and videos:
+                self.has_next = has_next
+            for video in videos:
+                if video["id"] not in self.videos:
+                    self.videos[video["id"]] = video
+                    new += 1
+                    if self.known_ids is not None:
+                        self.known_run = self.known_run + 1 if video["id"] in self.known_ids else 0
+        return new
+
+    @property
+    def caught_up(self):
+        return self.known_ids is not None and self.known_run >= self.stop_after_known
+
+    @property
+    def finished(self):
+        return self.has_next is False or self.caught_up
+
+
+class SpaceIndex:
+    """
+    Persisted per-space index of video id -> title/url/last_seen, so a sync
+    can stop paginating once it reaches videos it has already seen.
+    """
+
+    def __init__(self, path=SPACE_INDEX_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self.spaces = {}
+        try:
+            with open(path, "r") as f:
+                self.spaces = json.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"[SYNC] Could not read {path}, starting fresh: {e}")
+
+    def _space(self, space_url):
+        return self.spaces.setdefault(space_url, {"last_full_sync": 0, "videos": {}})
+
+    def known_ids(self, space_url):
+        with self.lock:
+            return set(self._space(space_url)["videos"])
+
+    def full_sync_due(self, space_url, interval_days=FULL_SYNC_INTERVAL_DAYS):
+        with self.lock:
+            space = self._space(space_url)
+            if not space["videos"]:
+                return True
+            return time.time() - space["last_full_sync"] > interval_days * 86400
+
+    def update(self, space_url, videos, full=False):
+        """
+        Record the videos seen by a crawl. A full crawl also drops ids that
+        are no longer listed. Returns the number of ids removed.
+        """
+        now = time.time()
+        removed = 0
+        with self.lock:
+            space = self._space(space_url)
+            seen = {}
+            for video in videos:
+                seen[video["id"]] = {"title": video["title"], "url": video["url"], "last_seen": now}
+            if full:
+                removed = len(set(space["videos"]) - set(seen))
+                space["videos"] = seen
+                space["last_full_sync"] = now
+            else:
+                space["videos"].update(seen)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.spaces, f)
+            os.replace(tmp_path, self.path)
+        return removed
+
+
+_space_index = None
+_space_index_lock = threading.Lock()
+
+
+def get_space_index():
+    global _space_index
+    with _space_index_lock:
+        if _space_index is None:
+            _space_index = SpaceIndex()
+        return _space_index
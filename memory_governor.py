@@ -0,0 +1,187 @@
+"""
+Memory governor for the browser pool.
+
+Chromium is what fills memory here, so the governor watches the resident
+set size of every process started by this one (Playwright drivers, Chromium
+browsers and their renderers, the login window). The sum is measured with
+psutil when it is installed, else by walking /proc. Pooled jobs are admitted
+only while that total is under the budget; otherwise they wait in the queue
+until a running job finishes. Idle slots close their browser when usage is
+near the budget. RSS counts shared pages once per process, so the total
+overstates real usage, which errs on the safe side.
+
+The budget comes from loom_config.json via `configure_memory_governor`:
+"browser_memory_budget_mb" (0 = 60% of physical memory, -1 = no limit).
+Where memory can't be measured (no psutil and no /proc), jobs always run.
+"""
+import threading
+import time
+import os
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Share of physical memory used as the budget when none is configured
+DEFAULT_BUDGET_FRACTION = 0.6
+# Idle browsers are shed once usage passes this share of the budget
+PRESSURE_FRACTION = 0.85
+# Measurements are reused for this long (walking /proc isn't free)
+MEASURE_INTERVAL = 1.0
+# Waiting jobs re-check memory at least this often
+ADMIT_POLL = 1.0
+
+
+def total_memory():
+    """Physical memory in bytes, or None if unknown."""
+    if psutil is not None:
+        return psutil.virtual_memory().total
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _proc_children():
+    """{parent pid: [child pids]} from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name may contain spaces or parentheses; fields resume after the last ')'
+        ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+    return children
+
+
+def _proc_rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def child_tree_rss(root_pid=None):
+    """Total RSS in bytes of every descendant of `root_pid` (this process by default), or None."""
+    root_pid = root_pid or os.getpid()
+    if psutil is not None:
+        total = 0
+        try:
+            descendants = psutil.Process(root_pid).children(recursive=True)
+        except psutil.Error:
+            return None
+        for proc in descendants:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    if not os.path.isdir("/proc"):
+        return None
+    children = _proc_children()
+    total = 0
+    pending = list(children.get(root_pid, []))
+    while pending:
+        pid = pending.pop()
+        total += _proc_rss(pid)
+        pending.extend(children.get(pid, []))
+    return total
+
+
+class MemoryGovernor:
+    """`budget` in bytes; None never holds anything back."""
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.changed = threading.Condition()
+        self._usage = None
+        self._measured_at = 0
+
+    def usage(self):
+        now = time.monotonic()
+        with self.changed:
+            if now - self._measured_at < MEASURE_INTERVAL:
+                return self._usage
+        usage = child_tree_rss()
+        with self.changed:
+            self._usage, self._measured_at = usage, now
+        return usage
+
+    def _over(self, fraction):
+        if not self.budget:
+            return False
+        usage = self.usage()
+        return usage is not None and usage >= self.budget * fraction
+
+    def over_budget(self):
+        return self._over(1.0)
+
+    def under_pressure(self):
+        return self._over(PRESSURE_FRACTION)
+
+    def admit(self, others_running, label=""):
+        """
+        Block until there is room for another job's context and page. A job
+        is always admitted when `others_running()` is false: nothing else
+        would free memory, so waiting could only deadlock. Returns the
+        seconds spent waiting (0 if admitted straight away).
+        """
+        start = None
+        while self.over_budget() and others_running():
+            if start is None:
+                start = time.monotonic()
+                print(f"[MEMORY] {label} waiting: browsers use {self.usage() / 1_000_000:.0f} MB "
+                      f"of a {self.budget / 1_000_000:.0f} MB budget")
+            with self.changed:
+                self.changed.wait(ADMIT_POLL)
+        if start is None:
+            return 0
+        waited = time.monotonic() - start
+        print(f"[MEMORY] {label} admitted after {waited:.0f}s")
+        return waited
+
+    def job_finished(self):
+        """Wake waiting jobs right away, with a fresh measurement."""
+        with self.changed:
+            self._measured_at = 0
+            self.changed.notify_all()
+
+
+_governor = MemoryGovernor()
+_governor_lock = threading.Lock()
+
+
+def configure_memory_governor(config):
+    """Build the shared governor from loom_config.json settings."""
+    global _governor
+    budget_mb = int(config.get("browser_memory_budget_mb") or 0)
+    if budget_mb < 0:
+        budget = None
+    elif budget_mb > 0:
+        budget = budget_mb * 1024 * 1024
+    else:
+        total = total_memory()
+        budget = int(total * DEFAULT_BUDGET_FRACTION) if total else None
+    if budget and child_tree_rss() is None:
+        print("[MEMORY] Can't measure browser memory here (install psutil); running without a budget")
+        budget = None
+    with _governor_lock:
+        _governor = MemoryGovernor(budget)
+    return _governor
+
+
+def get_memory_governor():
+    with _governor_lock:
+        return _governor
@@ -0,0 +1,103 @@
+"""
+Small declarative step runner for the Loom browser flows.
+
+Each Step waits on one concrete readiness condition (a selector, a network
+response, a URL change, a JS predicate or a file chooser) with its own
+timeout, optionally fires a trigger inside that wait and acts on whatever
+became ready. Every step records how long it actually waited, instead of the
+flows sleeping for a fixed worst case.
+"""
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+import time
+
+
+DEFAULT_STEP_TIMEOUT = 60000
+
+
+class StepTimeout(TimeoutError):
+    """A step's readiness condition did not hold within its timeout."""
+
+    def __init__(self, step_name, timeout_ms, cause=None):
+        super().__init__(f"Step '{step_name}' not ready after {timeout_ms / 1000:.0f}s: {cause}")
+        self.step_name = step_name
+
+
+class Step:
+    """
+    One step of a flow. Exactly one readiness condition should be given:
+
+    selector  - wait for the selector to reach `state` (default "visible")
+    response  - URL glob/regex/predicate of a response the trigger causes
+    url       - URL glob/regex/predicate the page should navigate to
+    function  - JS predicate (called with `arg`) that must become truthy
+    file_chooser - wait for the file chooser opened by the trigger
+
+    `trigger(page)` runs inside the wait (so responses it causes aren't
+    missed); `then(page, ready)` runs afterwards with the ready object.
+    """
+
+    def __init__(self, name, selector=None, state="visible", response=None, url=None,
+                 function=None, arg=None, file_chooser=False, trigger=None, then=None,
+                 timeout=DEFAULT_STEP_TIMEOUT):
+        self.name = name
+        self.selector = selector
+        self.state = state
+        self.response = response
+        self.url = url
+        self.function = function
+        self.arg = arg
+        self.file_chooser = file_chooser
+        self.trigger = trigger
+        self.then = then
+        self.timeout = timeout
+
+    def _fire(self, page):
+        if self.trigger:
+            self.trigger(page)
+
+    def wait(self, page):
+        if self.response is not None:
+            with page.expect_response(self.response, timeout=self.timeout) as info:
+                self._fire(page)
+            return info.value
+        if self.file_chooser:
+            with page.expect_file_chooser(timeout=self.timeout) as info:
+                self._fire(page)
+            return info.value
+        self._fire(page)
+        if self.url is not None:
+            page.wait_for_url(self.url, timeout=self.timeout)
+            return page.url
+        if self.selector is not None:
+            return page.wait_for_selector(self.selector, state=self.state, timeout=self.timeout)
+        if self.function is not None:
+            return page.wait_for_function(self.function, arg=self.arg, timeout=self.timeout)
+        return None
+
+
+def click(force=True):
+    """`then` helper: click the element the step waited for."""
+    return lambda page, element: element.click(force=force)
+
+
+def run_steps(page, steps, label=""):
+    """
+    Run `steps` in order. Returns {step name: ready object} plus the list of
+    (name, seconds waited) under the "timings" key.
+    """
+    results = {}
+    timings = []
+    for step in steps:
+        start = time.monotonic()
+        try:
+            ready = step.wait(page)
+        except PlaywrightTimeoutError as e:
+            raise StepTimeout(step.name, step.timeout, e) from e
+        timings.append((step.name, time.monotonic() - start))
+        if step.then:
+            step.then(page, ready)
+        results[step.name] = ready
+    summary = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in timings)
+    print(f"[STEPS] {label}: {summary}" if label else f"[STEPS] {summary}")
+    results["timings"] = timings
+    return results
@@ -0,0 +1,137 @@
+"""
+Request filter shared by every automated browser flow.
+
+Pooled pages block images, media and fonts (by the resource type Chromium
+assigns, whatever the URL looks like) plus every request to known
+analytics/tracking hosts. Scripts, stylesheets, XHR/fetch and documents on
+other hosts always go through, so Uppy's uploads, the share modal and the
+space listing API keep working.
+
+Interception uses the CDP Fetch domain with resource-type and host patterns
+rather than `page.route`: a route sends every request through the slot
+thread and turns off the HTTP cache, which would make each page load in a
+reused context download Loom's scripts again. Here Chromium only pauses the
+requests that match, and each of those is failed straight away. Blocked
+requests never download, so the savings are estimated from typical sizes
+per resource type and logged once per page load.
+
+Settings come from loom_config.json via `configure_resource_filter`:
+"block_resources" (on/off), "blocked_resource_types" and "blocked_hosts".
+"""
+from urllib.parse import urlsplit
+import threading
+
+
+DEFAULT_BLOCKED_TYPES = ("image", "media", "font")
+DEFAULT_BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "segment.io", "segment.com",
+    "hotjar.com", "fullstory.com", "intercom.io", "intercomcdn.com", "amplitude.com", "mixpanel.com",
+    "heapanalytics.com", "facebook.net", "sentry.io", "datadoghq.com",
+)
+# Config names -> CDP resource types that can be blocked
+BLOCKABLE_TYPES = {"image": "Image", "media": "Media", "font": "Font"}
+# Rough transfer sizes used to estimate what a blocked request would have cost
+ESTIMATED_BYTES = {
+    "image": 60_000,
+    "media": 1_500_000,
+    "font": 40_000,
+    "tracking": 20_000,
+}
+
+
+def _host_matches(host, domains):
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class PageFilterStats:
+    """Blocked-request counts for one page, reported and reset on every load."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total_requests = 0
+        self.total_bytes = 0
+        self._reset()
+
+    def _reset(self):
+        self.requests = 0
+        self.bytes = 0
+        self.by_kind = {}
+
+    def record(self, kind):
+        estimate = ESTIMATED_BYTES.get(kind, ESTIMATED_BYTES["tracking"])
+        with self.lock:
+            self.requests += 1
+            self.bytes += estimate
+            self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+            self.total_requests += 1
+            self.total_bytes += estimate
+
+    def report(self, url):
+        with self.lock:
+            if not self.requests:
+                return
+            kinds = ", ".join(f"{count} {kind}" for kind, count in sorted(self.by_kind.items()))
+            print(f"[ROUTE] {url}: blocked {self.requests} requests (~{self.bytes / 1_000_000:.1f} MB; {kinds})")
+            self._reset()
+
+
+class ResourceFilter:
+    def __init__(self, enabled=True, blocked_types=DEFAULT_BLOCKED_TYPES, blocked_hosts=DEFAULT_BLOCKED_HOSTS):
+        self.enabled = enabled
+        self.blocked_types = tuple(t for t in blocked_types if t in BLOCKABLE_TYPES)
+        self.blocked_hosts = tuple(blocked_hosts)
+        self.patterns = self._patterns()
+
+    def _patterns(self):
+        """Fetch.enable patterns: Chromium pauses only requests matching one of them."""
+        patterns = [{"urlPattern": "*", "resourceType": BLOCKABLE_TYPES[t], "requestStage": "Request"}
+                    for t in self.blocked_types]
+        for host in self.blocked_hosts:
+            patterns += [{"urlPattern": f"*://{host}/*", "requestStage": "Request"},
+                         {"urlPattern": f"*://*.{host}/*", "requestStage": "Request"}]
+        return patterns
+
+    def classify(self, url, resource_type):
+        """What a blocked request was, for the per-load breakdown."""
+        host = (urlsplit(url).hostname or "").lower()
+        if _host_matches(host, self.blocked_hosts):
+            return "tracking"
+        return resource_type.lower()
+
+    def attach(self, page):
+        """Start blocking on `page`. Returns its stats, or None when disabled."""
+        if not self.enabled or not self.patterns:
+            return None
+        session = page.context.new_cdp_session(page)
+        stats = PageFilterStats()
+
+        def on_paused(event):
+            # Everything paused matched a blocked type or host
+            stats.record(self.classify(event["request"]["url"], event.get("resourceType", "")))
+            session.send("Fetch.failRequest", {"requestId": event["requestId"], "errorReason": "BlockedByClient"})
+
+        session.on("Fetch.requestPaused", on_paused)
+        session.send("Fetch.enable", {"patterns": self.patterns})
+        page.on("load", lambda page: stats.report(page.url))
+        return stats
+
+
+_resource_filter = ResourceFilter()
+_resource_filter_lock = threading.Lock()
+
+
+def configure_resource_filter(config):
+    """Build the shared filter from loom_config.json settings."""
+    global _resource_filter
+    with _resource_filter_lock:
+        _resource_filter = ResourceFilter(
+            enabled=bool(config.get("block_resources", True)),
+            blocked_types=config.get("blocked_resource_types") or DEFAULT_BLOCKED_TYPES,
+            blocked_hosts=config.get("blocked_hosts") or DEFAULT_BLOCKED_HOSTS,
+        )
+    return _resource_filter
+
+
+def get_resource_filter():
+    with _resource_filter_lock:
+        return _resource_filter
@@ -0,0 +1,130 @@
+"""
+Failure classification and retry/backoff policy for uploads.
+
+Failures are sorted into a few categories so a batch can fail fast on the
+ones retrying won't fix (expired session, file rejected by Loom) and back
+off exponentially, with jitter, on transient ones. A circuit breaker shared
+by all upload workers pauses the whole queue when consecutive failures
+suggest Loom itself is down.
+"""
+from playwright.sync_api import Error as PlaywrightError
+from page_steps import StepTimeout
+import threading
+import random
+import time
+
+
+AUTH_EXPIRED = "auth expired"
+SELECTOR_MISSING = "selector missing"
+NETWORK_STALL = "network stall"
+SERVER_ERROR = "server error"
+FILE_REJECTED = "file rejected"
+UNKNOWN = "unknown"
+
+
+class UploadError(Exception):
+    category = UNKNOWN
+
+
+class AuthExpired(UploadError):
+    """Loom redirected to its login page: the saved session is no longer valid."""
+    category = AUTH_EXPIRED
+
+
+class FileRejected(UploadError):
+    """Loom/Uppy refused the file itself (type, size, restrictions)."""
+    category = FILE_REJECTED
+
+
+class ServerError(UploadError):
+    category = SERVER_ERROR
+
+
+class UploadStalled(UploadError, TimeoutError):
+    """Upload made no progress for too long."""
+    category = NETWORK_STALL
+
+
+def classify(exc):
+    """Map any exception raised by an upload attempt to a failure category."""
+    if isinstance(exc, UploadError):
+        return exc.category
+    if isinstance(exc, StepTimeout):
+        return SELECTOR_MISSING
+    message = str(exc).lower()
+    if isinstance(exc, TimeoutError):
+        return NETWORK_STALL
+    if isinstance(exc, PlaywrightError) and ("net::" in message or "target closed" in message):
+        return NETWORK_STALL
+    if any(code in message for code in (" 500", " 502", " 503", " 504", "internal server error")):
+        return SERVER_ERROR
+    return UNKNOWN
+
+
+def classify_uppy_error(text, message=None):
+    """
+    Turn an error message from Uppy's status bar/events into the matching
+    exception, carrying `message` (defaults to the text itself).
+    """
+    lowered = (text or "").lower()
+    message = message or text
+    if any(code in lowered for code in ("500", "502", "503", "504", "server")):
+        return ServerError(message)
+    if any(word in lowered for word in ("not allowed", "exceeds", "too large", "unsupported", "restriction")):
+        return FileRejected(message)
+    if any(word in lowered for word in ("network", "offline", "timed out", "connection")):
+        return UploadStalled(message)
+    return UploadError(message)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the n-th retry waits a random time
+    in [0, min(max_delay, base_delay * 2**(n-1))].
+    """
+
+    def __init__(self, max_attempts=6, base_delay=5, max_delay=300,
+                 non_retryable=(AUTH_EXPIRED, FILE_REJECTED)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.non_retryable = set(non_retryable)
+
+    def should_retry(self, category, attempt):
+        return category not in self.non_retryable and attempt < self.max_attempts
+
+    def delay(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures (from any worker) and keeps
+    every worker waiting for `cooldown` seconds before the next attempt.
+    A single success closes it again.
+    """
+
+    def __init__(self, threshold=5, cooldown=300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.open_until = 0
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.open_until = 0
+
+    def record_failure(self):
+        """Returns True if this failure tripped the breaker."""
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold and time.time() >= self.open_until:
+                self.open_until = time.time() + self.cooldown
+                return True
+            return False
+
+    def remaining(self):
+        with self.lock:
+            return max(0, self.open_until - time.time())
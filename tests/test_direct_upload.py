@@ -0,0 +1,81 @@
+"""Direct upload engine against the local stand-in server."""
+import threading
+import time
+import os
+
+import pytest
+
+# retry_policy (imported by direct_upload) uses Playwright's error types
+pytest.importorskip("playwright")
+
+from direct_upload import DirectUploader, UploadCancelled
+from retry_policy import AuthExpired
+import upload_standin
+
+
+CHUNK = 64 * 1024
+
+
+@pytest.fixture
+def standin():
+    server = upload_standin.serve(0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(os.urandom(CHUNK * 3 + 1000))
+    return path
+
+
+def cookies(expires_in=3600):
+    return [{"name": "connect.sid", "value": "abc", "domain": ".loom.com", "expires": time.time() + expires_in}]
+
+
+def uploader(base, cookie_list):
+    return DirectUploader(f"{base}/files/", cookie_list, f"{base}/finalize", chunk_size=CHUNK)
+
+
+def stored(upload_url):
+    upload_id = upload_url.rstrip("/").rsplit("/", 1)[-1]
+    return upload_id, bytes(upload_standin.StandinHandler.state.uploads[upload_id]["data"])
+
+
+def test_upload(standin, video):
+    created = []
+    share_url = uploader(standin, cookies()).upload(str(video), "clip.mp4", on_created=created.append)
+
+    upload_id, data = stored(created[0])
+    assert share_url == f"https://www.loom.com/share/{upload_id}"
+    assert data == video.read_bytes()
+
+
+def test_resume_after_cancel(standin, video):
+    engine = uploader(standin, cookies())
+    created = []
+
+    def cancel(percent, mbps):
+        raise UploadCancelled()
+
+    with pytest.raises(UploadCancelled):
+        engine.upload(str(video), "clip.mp4", on_progress=cancel, on_created=created.append)
+    assert engine.offset(created[0]) == CHUNK
+
+    sent = []
+    share_url = engine.upload(str(video), "clip.mp4", on_progress=lambda percent, mbps: sent.append(percent),
+                              upload_url=created[0])
+
+    upload_id, data = stored(created[0])
+    assert share_url.endswith(upload_id)
+    assert data == video.read_bytes()
+    assert len(sent) == 3  # only the chunks after the first went again
+    assert sent[-1] == 100
+
+
+def test_expired_cookies_raise_auth_expired(standin, video):
+    with pytest.raises(AuthExpired):
+        uploader(standin, cookies(expires_in=-60)).upload(str(video), "clip.mp4")
@@ -0,0 +1,110 @@
+"""Pure helpers: space listing parser, Drive name claims, listbox mirroring."""
+from drive_manifest import DriveManifest
+from folder_watch import ListboxMirror
+from loom_space import parse_space_page
+
+
+VIDEO_A = "a" * 32
+VIDEO_B = "b" * 32
+FOLDER = "c" * 32
+
+
+def test_parse_space_page_keeps_videos_only():
+    data = {"data": {"space": {
+        "__typename": "Space", "id": FOLDER, "name": "Team space",
+        "folders": [{"__typename": "Folder", "id": FOLDER, "name": "Archive"}],
+        "members": [{"id": FOLDER, "name": "Jane"}],
+        "videos": {
+            "pageInfo": {"hasNextPage": True},
+            "edges": [
+                {"node": {"__typename": "RegularUserVideo", "id": VIDEO_A, "name": "Intro"}},
+                {"node": {"id": VIDEO_B, "name": "Demo", "share_url": f"https://www.loom.com/share/{VIDEO_B}?t=1"}},
+            ],
+        },
+    }}}
+
+    videos, has_next = parse_space_page(data)
+
+    assert videos == [
+        {"id": VIDEO_A, "title": "Intro", "url": f"https://www.loom.com/share/{VIDEO_A}"},
+        {"id": VIDEO_B, "title": "Demo", "url": f"https://www.loom.com/share/{VIDEO_B}?t=1"},
+    ]
+    assert has_next is True
+
+
+def test_parse_space_page_pagination_flags():
+    assert parse_space_page({"videos": [], "has_more": False}) == ([], False)
+    assert parse_space_page({"videos": []}) == ([], None)
+
+
+def test_claim_local_name_keeps_duplicates_apart(tmp_path):
+    manifest = DriveManifest(str(tmp_path / "manifest.json"))
+
+    first = manifest.claim_local_name({"id": "id-one-000", "name": "demo.mp4"})
+    in_folder = manifest.claim_local_name({"id": "id-two-000", "name": "demo.mp4", "folder_path": "Sales/Q1"})
+    no_folder = manifest.claim_local_name({"id": "id-three-00", "name": "demo.mp4"})
+
+    assert first == "demo.mp4"
+    assert in_folder == "Sales - Q1 - demo.mp4"
+    assert no_folder == "demo [id-three].mp4"
+    # A file keeps its name on later listings
+    assert manifest.claim_local_name({"id": "id-two-000", "name": "demo.mp4"}) == in_folder
+
+
+def test_claim_local_name_survives_reload(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = DriveManifest(path)
+    video = {"id": "id-one-000", "name": "demo.mp4", "md5Checksum": "x", "modifiedTime": "t"}
+    manifest.record_download(video, manifest.claim_local_name(video))
+
+    reloaded = DriveManifest(path)
+    assert reloaded.claim_local_name({"id": "id-other-0", "name": "demo.mp4"}) == "demo [id-other].mp4"
+
+
+class FakeListbox:
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.calls = 0
+
+    def get(self, first, last):
+        return tuple(self.items)
+
+    def delete(self, first, last=None):
+        self.calls += 1
+        if last == "end":
+            del self.items[first:]
+        else:
+            del self.items[first]
+
+    def insert(self, index, *names):
+        self.calls += 1
+        if index == "end":
+            self.items.extend(names)
+        else:
+            self.items[index:index] = names
+
+
+def test_listbox_mirror_sync_keeps_rows_in_place():
+    listbox = FakeListbox(["a.mp4", "b.mp4", "c.mp4", "d.mp4"])
+    mirror = ListboxMirror(listbox)
+
+    mirror.sync(["a.mp4", "c.mp4", "d.mp4", "e.mp4"])
+    assert listbox.items == ["a.mp4", "c.mp4", "d.mp4", "e.mp4"]
+
+    calls = listbox.calls
+    mirror.sync(["a.mp4", "c.mp4", "d.mp4", "e.mp4"])
+    assert listbox.calls == calls  # nothing changed, nothing touched
+
+    mirror.rename("c.mp4", "c2.mp4")
+    mirror.remove("a.mp4")
+    assert listbox.items == ["c2.mp4", "d.mp4", "e.mp4"]
+    assert mirror.index == {"c2.mp4": 0, "d.mp4": 1, "e.mp4": 2}
+
+
+def test_listbox_mirror_sync_rebuilds_when_mostly_cleared():
+    listbox = FakeListbox(["a.mp4", "b.mp4", "c.mp4", "d.mp4"])
+    mirror = ListboxMirror(listbox)
+
+    mirror.sync(["d.mp4", "f.mp4"])
+    assert listbox.items == ["d.mp4", "f.mp4"]
+    assert mirror.names == listbox.items
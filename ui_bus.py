@@ -0,0 +1,130 @@
+"""
+Application-wide event bus between worker threads and the Tk thread.
+
+Every background action gets a TaskChannel (a put-only stand-in for the
+progress queue it used to own). All channels feed one queue that a single
+dispatcher loop drains on the Tk thread. Within a tick, progress-style
+messages are coalesced to the latest value per task (and per worker), and
+at most `max_per_tick` messages are handled before control goes back to Tk.
+A task is retired as soon as its thread finishes, and the loop stops
+rescheduling itself once no task is active and nothing is pending.
+"""
+from collections import OrderedDict
+import itertools
+import threading
+import queue
+
+
+TICK_MS = 50
+MAX_PER_TICK = 200
+# Cap on raw messages pulled off the queue per tick (cheap, but not unbounded)
+MAX_DRAIN_PER_TICK = 5000
+TASK_DONE = "task_done"
+
+# Only the newest of these matters; older ones in the same tick are dropped
+COALESCED_KINDS = {"download", "upload", "batch_progress", "current_embed", "status"}
+
+
+def coalesce_key(task_id, item):
+    kind = item[0]
+    if kind not in COALESCED_KINDS:
+        return None
+    if kind in ("download", "upload"):
+        # One line per worker: keep each worker's latest state
+        worker_id = item[3] if len(item) > 3 else None
+        return (task_id, kind, worker_id)
+    return (task_id, kind)
+
+
+class TaskChannel:
+    """The progress_queue handed to one background task: every put is tagged with the task id."""
+
+    def __init__(self, bus, task_id, name):
+        self.bus = bus
+        self.task_id = task_id
+        self.name = name
+
+    def put(self, item, *args, **kwargs):
+        self.bus.queue.put((self.task_id, item))
+
+    put_nowait = put
+
+
+class EventBus:
+    def __init__(self, handler, schedule, tick_ms=TICK_MS, max_per_tick=MAX_PER_TICK):
+        """
+        `handler(item)` handles one message on the Tk thread;
+        `schedule(ms, callback)` is usually `root.after`.
+        """
+        self.handler = handler
+        self.schedule = schedule
+        self.tick_ms = tick_ms
+        self.max_per_tick = max_per_tick
+        self.queue = queue.Queue()
+        self.pending = OrderedDict()
+        self.active = {}
+        self.ids = itertools.count(1)
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.running = False
+
+    def open_task(self, name=""):
+        with self.lock:
+            channel = TaskChannel(self, next(self.ids), name)
+            self.active[channel.task_id] = channel
+        self._ensure_loop()
+        return channel
+
+    def start_task(self, target, *args, name=""):
+        """Run `target(channel, *args)` in a new thread; the task retires when it returns."""
+        channel = self.open_task(name or getattr(target, "__name__", ""))
+
+        def run():
+            try:
+                target(channel, *args)
+            finally:
+                self.queue.put((channel.task_id, (TASK_DONE,)))
+
+        threading.Thread(target=run, name=f"task-{channel.task_id}").start()
+        return channel
+
+    def _ensure_loop(self):
+        # Called from the Tk thread (button handlers), so no cross-thread scheduling
+        if not self.running:
+            self.running = True
+            self.schedule(self.tick_ms, self._tick)
+
+    def _drain(self):
+        for _ in range(MAX_DRAIN_PER_TICK):
+            try:
+                task_id, item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            key = coalesce_key(task_id, item)
+            if key is None:
+                key = ("event", next(self.seq))
+            else:
+                # Move to the end so the latest value keeps its place relative to other events
+                self.pending.pop(key, None)
+            self.pending[key] = (task_id, item)
+
+    def _tick(self):
+        self._drain()
+        handled = 0
+        while self.pending and handled < self.max_per_tick:
+            _, (task_id, item) = self.pending.popitem(last=False)
+            handled += 1
+            if item[0] == TASK_DONE:
+                with self.lock:
+                    self.active.pop(task_id, None)
+                continue
+            try:
+                self.handler(item)
+            except Exception as e:
+                print(f"[UI] Error handling {item[0]!r}: {e}")
+        with self.lock:
+            idle = not self.active and not self.pending and self.queue.empty()
+        if idle:
+            self.running = False
+            return
+        self.schedule(self.tick_ms, self._tick)
@@ -0,0 +1,128 @@
+"""
+Local stand-in for Loom's upload endpoints, for exercising the direct upload
+engine offline:
+
+    python upload_standin.py [port]
+
+then set in loom_config.json:
+
+    "upload_engine": "direct",
+    "direct_upload_endpoint": "http://127.0.0.1:8765/files/",
+    "direct_upload_finalize_url": "http://127.0.0.1:8765/finalize"
+
+Implements tus creation/HEAD/PATCH (uploads are kept in memory) and a
+finalize call that returns a fake share URL. The engine sends it the saved
+Loom cookies; requests without a Loom auth cookie (none saved, or all
+expired) are answered with 401, like an expired session.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from loom_session import AUTH_COOKIE_HINTS
+import threading
+import base64
+import json
+import uuid
+import sys
+
+
+DEFAULT_PORT = 8765
+
+
+class StandinState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.uploads = {}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = StandinState()
+
+    def _reply(self, status, headers=None, body=b""):
+        self.send_response(status)
+        self.send_header("Tus-Resumable", "1.0.0")
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _authorized(self):
+        names = [pair.split("=", 1)[0].strip().lower() for pair in (self.headers.get("Cookie") or "").split(";")]
+        if any(hint in name for name in names for hint in AUTH_COOKIE_HINTS):
+            return True
+        self._body()
+        self._reply(401)
+        return False
+
+    def _upload(self):
+        upload_id = self.path.rstrip("/").rsplit("/", 1)[-1]
+        with self.state.lock:
+            return upload_id, self.state.uploads.get(upload_id)
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.startswith("/finalize"):
+            request = json.loads(self._body() or b"{}")
+            upload_id = request.get("upload_url", "").rstrip("/").rsplit("/", 1)[-1]
+            with self.state.lock:
+                upload = self.state.uploads.get(upload_id)
+            if not upload or len(upload["data"]) != upload["length"]:
+                self._reply(409, body=b'{"error": "upload incomplete"}')
+                return
+            body = json.dumps({"share_url": f"https://www.loom.com/share/{upload_id}"}).encode()
+            self._reply(200, {"Content-Type": "application/json"}, body)
+            return
+
+        self._body()
+        metadata = {}
+        for pair in (self.headers.get("Upload-Metadata") or "").split(","):
+            if " " in pair:
+                key, value = pair.split(" ", 1)
+                metadata[key] = base64.b64decode(value).decode()
+        upload_id = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.uploads[upload_id] = {"length": int(self.headers["Upload-Length"]),
+                                             "data": bytearray(), "metadata": metadata}
+        print(f"[STANDIN] created {upload_id} for {metadata.get('filename')}")
+        self._reply(201, {"Location": f"/files/{upload_id}"})
+
+    def do_HEAD(self):
+        if not self._authorized():
+            return
+        _, upload = self._upload()
+        if upload is None:
+            self._reply(404)
+            return
+        self._reply(200, {"Upload-Offset": str(len(upload["data"])),
+                          "Upload-Length": str(upload["length"])})
+
+    def do_PATCH(self):
+        if not self._authorized():
+            return
+        chunk = self._body()
+        _, upload = self._upload()
+        if upload is None:
+            self._reply(404)
+            return
+        with self.state.lock:
+            if int(self.headers.get("Upload-Offset", -1)) != len(upload["data"]):
+                self._reply(409)
+                return
+            upload["data"].extend(chunk)
+            offset = len(upload["data"])
+        self._reply(204, {"Upload-Offset": str(offset)})
+
+
+def serve(port=DEFAULT_PORT):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    print(f"[STANDIN] listening on http://127.0.0.1:{server.server_address[1]}/files/")
+    return server
+
+
+if __name__ == "__main__":
+    serve(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT).serve_forever()
@@ -0,0 +1,101 @@
+"""
+Push-based Uppy progress for the upload flow.
+
+An init script installs a MutationObserver on Uppy's status bar (and hooks
+Uppy's own events when an instance is reachable) and pushes progress,
+completion and error events to Python through `page.expose_binding`. The
+upload loop then blocks in a single in-page wait until the next event
+arrives, instead of querying the status bar every few seconds.
+"""
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+
+BINDING_NAME = "loomUploadEvent"
+
+UPPY_MONITOR_JS = """
+(() => {
+    if (window.__loomUppy) return;
+    const state = window.__loomUppy = {seq: 0, text: '', hooked: false};
+    const emit = (event) => {
+        state.seq += 1;
+        event.seq = state.seq;
+        try { window.%(binding)s(event); } catch (e) {}
+    };
+    const hookUppy = () => {
+        const uppy = window.uppy || (window.Uppy && window.Uppy.instance);
+        if (state.hooked || !uppy || typeof uppy.on !== 'function') return;
+        state.hooked = true;
+        uppy.on('upload-progress', (file, p) => {
+            if (!p || !p.bytesTotal) return;
+            emit({kind: 'progress', percent: Math.floor(p.bytesUploaded * 100 / p.bytesTotal),
+                  bytes: p.bytesUploaded, total: p.bytesTotal});
+        });
+        uppy.on('upload-error', (file, err) => emit({kind: 'error', text: String((err && err.message) || err)}));
+        uppy.on('restriction-failed', (file, err) => emit({kind: 'rejected', text: String((err && err.message) || err)}));
+    };
+    const read = () => {
+        hookUppy();
+        const el = document.querySelector('.uppy-StatusBar-statusPrimary');
+        if (!el) return;
+        const text = el.innerText.trim();
+        if (text === state.text) return;
+        state.text = text;
+        const match = text.match(/Uploading:\\s*(\\d+)%%/);
+        if (match) {
+            emit({kind: 'progress', percent: parseInt(match[1], 10), text: text});
+        } else if (text.includes('Complete')) {
+            emit({kind: 'complete', text: text});
+        } else if (document.querySelector('.uppy-StatusBar.is-error') || /failed|error/i.test(text)) {
+            emit({kind: 'error', text: text});
+        } else {
+            emit({kind: 'status', text: text});
+        }
+    };
+    const start = () => {
+        new MutationObserver(read).observe(document.documentElement,
+            {subtree: true, childList: true, characterData: true, attributes: true});
+        read();
+    };
+    if (document.documentElement) start();
+    else document.addEventListener('DOMContentLoaded', start);
+})();
+""" % {"binding": BINDING_NAME}
+
+# Resolves in-page as soon as an event newer than `seq` has been emitted
+NEXT_EVENT_JS = "seq => window.__loomUppy && window.__loomUppy.seq > seq"
+
+
+class UppyMonitor:
+    """
+    Collects events pushed from the page. Create it before navigating so the
+    init script is in place for every document the page loads.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.events = []
+        self.last_seq = 0
+        page.expose_binding(BINDING_NAME, self._on_event)
+        page.add_init_script(UPPY_MONITOR_JS)
+
+    def _on_event(self, source, event):
+        self.events.append(event)
+        self.last_seq = max(self.last_seq, event.get("seq", 0))
+
+    def next_events(self, timeout_ms):
+        """
+        Wait up to `timeout_ms` for new events and return them (possibly an
+        empty list on timeout). Bindings are dispatched while we are blocked
+        inside the Playwright call, so events arrive without any polling
+        roundtrips from Python.
+        """
+        if not self.events:
+            try:
+                self.page.wait_for_function(NEXT_EVENT_JS, arg=self.last_seq, timeout=timeout_ms)
+                if not self.events:
+                    # The binding call may still be in flight; one cheap roundtrip flushes it
+                    self.page.evaluate("() => 0")
+            except PlaywrightTimeoutError:
+                pass
+        events, self.events = self.events, []
+        return events
@@ -0,0 +1,199 @@
+"""
+SQLite ledger of uploaded/synced Loom videos.
+
+This is the source of truth for titles, URLs and embed codes. Rows are
+appended as videos are uploaded or discovered, and lookups by URL or title
+go through indexes instead of scanning a workbook. `uploaded_videos.xlsx`
+is only an export, regenerated in batches (see `export_excel_if_stale`) or
+on demand.
+"""
+from openpyxl import Workbook, load_workbook
+import threading
+import sqlite3
+import time
+import os
+
+
+LEDGER_FILE = "uploaded_videos.db"
+EXCEL_FILE = "uploaded_videos.xlsx"
+EXCEL_SHEET = "Videos"
+EXCEL_HEADERS = ["Video Title", "URL", "Embed Code"]
+# Rewrite the xlsx export after this many ledger changes during a long batch
+EXPORT_EVERY = 25
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL DEFAULT '',
+    url TEXT NOT NULL DEFAULT '',
+    embed_code TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_videos_url ON videos(url);
+CREATE INDEX IF NOT EXISTS idx_videos_title ON videos(title);
+"""
+
+
+def embed_is_current(url, embed_code):
+    """True if `embed_code` exists and embeds the video `url` points at."""
+    if not embed_code:
+        return False
+    if "/share/" not in url:
+        return True  # nothing to derive an embed from, keep whatever is there
+    video_id = url.split("/share/")[-1].split("?")[0]
+    return video_id in embed_code
+
+
+class VideoLedger:
+    def __init__(self, path=LEDGER_FILE, excel_file=EXCEL_FILE):
+        self.path = path
+        self.excel_file = excel_file
+        self.lock = threading.RLock()
+        self.changes_since_export = 0
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+        if self.count() == 0 and os.path.exists(excel_file):
+            self.import_excel(excel_file)
+
+    # -- writes -------------------------------------------------------------
+    def add_video(self, title, url, embed_code=""):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO videos (title, url, embed_code, created_at) VALUES (?, ?, ?, ?)",
+                (title or "", url or "", embed_code or "", time.strftime("%Y-%m-%dT%H:%M:%S"))
+            )
+            self.changes_since_export += 1
+
+    def set_embed_code(self, url, embed_code):
+        """Set the embed code on every row for `url`. Returns the number of rows changed."""
+        with self.lock, self.conn:
+            cursor = self.conn.execute("UPDATE videos SET embed_code = ? WHERE url = ?", (embed_code, url))
+            self.changes_since_export += cursor.rowcount
+            return cursor.rowcount
+
+    def refresh_embed_codes(self, make_embed, batch_size=500):
+        """
+        One streaming pass over the ledger that (re)generates only the embed
+        codes that are missing or no longer point at the row's URL. Rows are
+        read in id-ordered pages, so memory stays flat on very large ledgers.
+        Returns (updated, unchanged).
+        """
+        updated = unchanged = 0
+        last_id = 0
+        while True:
+            with self.lock:
+                page = self.conn.execute(
+                    "SELECT id, url, embed_code FROM videos WHERE id > ? AND url != '' ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                ).fetchall()
+            if not page:
+                break
+            last_id = page[-1]["id"]
+            changes = []
+            for row in page:
+                if embed_is_current(row["url"], row["embed_code"]):
+                    unchanged += 1
+                    continue
+                embed_code = make_embed(row["url"])
+                if embed_code:
+                    changes.append((embed_code, row["id"]))
+            if changes:
+                with self.lock, self.conn:
+                    self.conn.executemany("UPDATE videos SET embed_code = ? WHERE id = ?", changes)
+                    self.changes_since_export += len(changes)
+                updated += len(changes)
+        return updated, unchanged
+
+    # -- reads --------------------------------------------------------------
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def find_by_url(self, url):
+        with self.lock:
+            return self.conn.execute("SELECT * FROM videos WHERE url = ? ORDER BY id", (url,)).fetchall()
+
+    def find_by_title(self, title):
+        with self.lock:
+            return self.conn.execute("SELECT * FROM videos WHERE title = ? ORDER BY id", (title,)).fetchall()
+
+    def has_url(self, url):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM videos WHERE url = ? LIMIT 1", (url,)).fetchone() is not None
+
+    def urls(self):
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT url FROM videos WHERE url != ''")}
+
+    def urls_with_embed(self):
+        """URLs that already have an embed code recorded."""
+        with self.lock:
+            return {row[0] for row in self.conn.execute(
+                "SELECT DISTINCT url FROM videos WHERE url != '' AND embed_code != ''")}
+
+    def rows(self):
+        with self.lock:
+            return self.conn.execute("SELECT id, title, url, embed_code FROM videos ORDER BY id").fetchall()
+
+    # -- Excel import/export ------------------------------------------------
+    def import_excel(self, excel_file):
+        """One-time migration of an existing uploaded_videos.xlsx into the ledger."""
+        wb = load_workbook(excel_file, read_only=True)
+        try:
+            ws = wb[EXCEL_SHEET] if EXCEL_SHEET in wb.sheetnames else wb.active
+            rows = ws.iter_rows(values_only=True)
+            headers = {name: i for i, name in enumerate(next(rows, ()) or ())}
+            title_i = headers.get("Video Title", 0)
+            url_i = headers.get("URL", 1)
+            embed_i = headers.get("Embed Code")
+            now = time.strftime("%Y-%m-%dT%H:%M:%S")
+
+            def records():
+                for row in rows:
+                    if not row or not any(row):
+                        continue
+                    get = lambda i: (row[i] if i is not None and i < len(row) and row[i] is not None else "")
+                    yield (str(get(title_i)), str(get(url_i)), str(get(embed_i)), now)
+
+            with self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT INTO videos (title, url, embed_code, created_at) VALUES (?, ?, ?, ?)",
+                    records()
+                )
+        finally:
+            wb.close()
+        print(f"[LEDGER] Imported {self.count()} rows from {excel_file}")
+
+    def export_excel(self, excel_file=None):
+        """Regenerate the xlsx export from the ledger in one streaming write."""
+        excel_file = excel_file or self.excel_file
+        with self.lock:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(EXCEL_SHEET)
+            ws.append(EXCEL_HEADERS)
+            for row in self.conn.execute("SELECT title, url, embed_code FROM videos ORDER BY id"):
+                ws.append(list(row))
+            tmp_file = excel_file + ".tmp.xlsx"
+            wb.save(tmp_file)
+            os.replace(tmp_file, excel_file)
+            self.changes_since_export = 0
+
+    def export_excel_if_stale(self, every=EXPORT_EVERY):
+        with self.lock:
+            if self.changes_since_export >= every:
+                self.export_excel()
+
+
+_ledger = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger():
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = VideoLedger()
+        return _ledger